@@ -2,213 +2,301 @@ import csv
 import re
 import json
 import time
+import asyncio
+import random
 import os
-import requests
+import hashlib
+import sqlite3
+import httpx
 import io
 import threading
+import contextvars
 import queue
 from flask import Flask, request, render_template_string, send_file, jsonify, Response, stream_with_context, session
 from collections import Counter, defaultdict
-from urllib.parse import urlparse, urlunparse
-from openai import OpenAI
+from itertools import chain
+from contextlib import closing
+from urllib.parse import urlparse
+from openai import OpenAI, APIConnectionError, APIStatusError
+import llm_cache
+import llm_json
+import llm_backends
+from stats import bump, job_stats, stats_snapshot, stats_since
+from page_fetch import (fetch_pages, parse_sitemap, sitemap_locs, unique_urls, parse_lastmod,
+                        domain_rates, fetch_stats_msg, parse_retry_after)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "llms-txt-secret-2024")
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
 
-APP_PASSWORD   = os.environ.get("APP_PASSWORD", "")
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
-MODEL          = "gpt-4o-mini"
-HEADERS        = {"User-Agent": "Mozilla/5.0 (compatible; llms-txt-generator/1.0)"}
-jobs           = {}
+APP_PASSWORD    = os.environ.get("APP_PASSWORD", "")
+OPENAI_API_KEY  = os.environ.get("OPENAI_API_KEY", "")
+MODEL           = "gpt-4o-mini"
+STATE_DB        = os.environ.get("STATE_DB", "llms_state.db")
+LLM_BACKEND     = os.environ.get("LLM_BACKEND", "openai")
+LLM_WORKERS     = int(os.environ.get("LLM_WORKERS", 8))
+LLM_RPM         = int(os.environ.get("LLM_RPM", 500))
+LLM_TPM         = int(os.environ.get("LLM_TPM", 200000))
+LLM_CLIENTS     = int(os.environ.get("LLM_CLIENTS", 32))
+LLM_RETRIES     = int(os.environ.get("LLM_RETRIES", 5))
+LLM_BACKOFF     = float(os.environ.get("LLM_BACKOFF", 1.0))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", 60))
+LLM_BREAKER     = int(os.environ.get("LLM_BREAKER", 5))
+LLM_COOLDOWN    = float(os.environ.get("LLM_COOLDOWN", 30))
+BATCH_API_SIZE  = int(os.environ.get("BATCH_API_SIZE", 10000))
+BATCH_API_POLL  = float(os.environ.get("BATCH_API_POLL", 30))
+
+LLM_BATCH_PAGES  = int(os.environ.get("LLM_BATCH_PAGES", 8))
+LLM_BATCH_TOKENS = int(os.environ.get("LLM_BATCH_TOKENS", 12000))
+
+jobs            = {}
 
 # ─────────────────────────────────────────────────────
 # LLM
 # ─────────────────────────────────────────────────────
-def call_llm(prompt, api_key):
-    client = OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=600,
-    )
-    return response.choices[0].message.content.strip()
-
-# ─────────────────────────────────────────────────────
-# URL UTILITIES
-# ─────────────────────────────────────────────────────
-def clean_url(url):
+async def acall_llm(prompt, api_key, max_tokens=600, stage="llm", fresh=False, schema=None):
+    cached = None if fresh else await asyncio.to_thread(llm_cache.lookup, MODEL, prompt, 0.2)
+    if llm_cache.LLM_CACHE_DB:
+        bump(llm_cache.stat_key(stage, cached is not None))
+    if cached is not None:
+        return cached
+
+    limiter  = llm_limiter(api_key)
+    estimate = len(prompt) // 4 + max_tokens
+    backend  = llm_backend(api_key)
+    for attempt in range(LLM_RETRIES + 1):
+        await limiter.acquire(estimate)
+        try:
+            reply = await backend.complete(prompt, max_tokens=max_tokens, temperature=0.2, schema=schema)
+        except Exception as e:
+            status = e.status_code if isinstance(e, APIStatusError) else None
+            if attempt == LLM_RETRIES or not retryable(e, status):
+                if status and status != 429:
+                    limiter.success()
+                else:
+                    limiter.failure(0)
+                raise
+            bump("llm_retries")
+            delay = backoff(attempt)
+            if status == 429:
+                bump("llm_rate_limited")
+                limiter.failure(llm_retry_after(e.response.headers) or delay)
+            else:
+                limiter.failure(0)
+                bump("llm_throttled_ms", int(delay * 1000))
+                await asyncio.sleep(delay)
+            continue
+        limiter.success()
+        break
+    used = reply["prompt_tokens"] + reply["completion_tokens"] or estimate
+    limiter.settle(estimate, used)
+    bump("llm_requests")
+    bump("llm_tokens", used)
+    await asyncio.to_thread(llm_cache.store, MODEL, prompt, 0.2, reply["text"])
+    return reply["text"]
+
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+def retryable(e, status):
+    if status == 429 and getattr(e, "code", None) == "insufficient_quota":
+        return False
+    return status in RETRY_STATUSES or isinstance(e, APIConnectionError)
+
+def backoff(attempt):
+    delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+DURATION_RE = re.compile(r"([\d.]+)(ms|s|m|h)")
+
+def llm_retry_after(headers):
+    if headers.get("retry-after-ms"):
+        try:
+            return min(float(headers["retry-after-ms"]) / 1000, 120.0)
+        except ValueError:
+            pass
+    seconds = parse_retry_after(headers.get("retry-after"))
+    if seconds is not None:
+        return seconds
+    resets = [sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit] for n, unit in DURATION_RE.findall(value))
+              for value in (headers.get("x-ratelimit-reset-requests"), headers.get("x-ratelimit-reset-tokens")) if value]
+    return min(max(resets), 120.0) if resets else None
+
+def parse_reply(raw):
     try:
-        parsed = urlparse(url)
-        path   = re.sub(r'/{2,}', '/', parsed.path)
-        return urlunparse((parsed.scheme, parsed.netloc, path, '', '', ''))
-    except:
-        return url
+        value, repaired = llm_json.parse(raw)
+    except ValueError:
+        bump("llm_parse_failed")
+        raise
+    bump("llm_parse_repaired" if repaired else "llm_parse_ok")
+    return value
+
+# Evicted clients are closed only after the 60s request timeout has passed, so
+# requests still running on them finish first.
+LLM_CLIENT_GRACE  = 90
+_llm_clients      = {}
+_llm_clients_lock = threading.Lock()
+
+def llm_client(api_key):
+    with _llm_clients_lock:
+        client = _llm_clients.pop(api_key, None)
+        if client is None:
+            bump("llm_clients_created")
+            client = OpenAI(api_key=api_key, http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=LLM_WORKERS * 2, max_keepalive_connections=LLM_WORKERS, keepalive_expiry=60),
+                timeout=httpx.Timeout(60, connect=10),
+            ))
+        _llm_clients[api_key] = client
+        if len(_llm_clients) > LLM_CLIENTS:
+            evicted = _llm_clients.pop(next(iter(_llm_clients)))
+            closer  = threading.Timer(LLM_CLIENT_GRACE, evicted.close)
+            closer.daemon = True
+            closer.start()
+        return client
+
+_llm_backends      = {}
+_llm_backends_lock = threading.Lock()
+
+def llm_backend(api_key):
+    with _llm_backends_lock:
+        backend = _llm_backends.pop(api_key, None)
+        if backend is None:
+            bump("llm_clients_created")
+            if LLM_BACKEND == "fake":
+                backend = llm_backends.FakeBackend()
+            else:
+                backend = llm_backends.OpenAIBackend(api_key, MODEL, max_connections=LLM_WORKERS * 2)
+        _llm_backends[api_key] = backend
+        if len(_llm_backends) > LLM_CLIENTS:
+            llm_backends.submit(llm_backends.close_later(_llm_backends.pop(next(iter(_llm_backends))), LLM_CLIENT_GRACE))
+        return backend
 
 # ─────────────────────────────────────────────────────
-# SITEMAP PARSING
+# LLM RATE LIMITING
 # ─────────────────────────────────────────────────────
-def parse_sitemap(source, is_file=False):
-    import xml.etree.ElementTree as ET
-
-    def extract_urls(xml_text):
-        urls = []
-        try:
-            root = ET.fromstring(xml_text)
-            ns   = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-            for child in root.findall("sm:sitemap", ns):
-                loc = child.find("sm:loc", ns)
-                if loc is not None and loc.text:
-                    try:
-                        r = requests.get(loc.text.strip(), headers=HEADERS, timeout=10)
-                        if r.status_code == 200:
-                            urls.extend(extract_urls(r.text))
-                    except:
-                        pass
-            for url_el in root.findall("sm:url", ns):
-                loc = url_el.find("sm:loc", ns)
-                if loc is not None and loc.text:
-                    urls.append(loc.text.strip())
-        except ET.ParseError:
-            pass
-        return urls
-
-    if is_file:
-        xml_text = source.decode("utf-8", errors="ignore") if isinstance(source, bytes) else source
-    else:
-        try:
-            r = requests.get(source, headers=HEADERS, timeout=15)
-            if r.status_code != 200:
-                return [], f"Could not fetch sitemap (HTTP {r.status_code})"
-            xml_text = r.text
-        except Exception as e:
-            return [], str(e)
-
-    return extract_urls(xml_text), None
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.lock  = threading.Lock()
+        self.stamp = time.monotonic()
+        self.configure(per_minute)
+        self.level = self.capacity
+
+    def configure(self, per_minute):
+        self.rate     = max(per_minute, 1) / 60
+        self.capacity = max(per_minute / 6, 1)
+
+    def refill(self):
+        now        = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, n):
+        with self.lock:
+            self.refill()
+            self.level -= min(n, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def give(self, n):
+        with self.lock:
+            self.refill()
+            self.level = min(self.capacity, self.level + n)
+
+class LLMLimiter:
+    def __init__(self, rpm, tpm):
+        self.requests     = TokenBucket(rpm)
+        self.tokens       = TokenBucket(tpm)
+        self.lock         = threading.Lock()
+        self.paused_until = 0.0
+        self.failures     = 0
+        self.probing      = False
+
+    def configure(self, rpm, tpm):
+        self.requests.configure(rpm)
+        self.tokens.configure(tpm)
+
+    async def acquire(self, estimate):
+        await self.wait_until_closed()
+        delay = max(self.requests.take(1), self.tokens.take(estimate))
+        if delay > 0:
+            bump("llm_wait_ms", int(delay * 1000))
+            await asyncio.sleep(delay)
+
+    # Circuit breaker shared by every worker using this key. A 429 pauses them
+    # all until Retry-After; LLM_BREAKER failures in a row open the breaker for
+    # LLM_COOLDOWN seconds, after which a single request probes the API.
+    async def wait_until_closed(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until and not self.probing:
+                    self.probing = self.failures >= LLM_BREAKER
+                    return
+                delay = max(self.paused_until - now, 0.05)
+            bump("llm_throttled_ms", int(delay * 1000))
+            await asyncio.sleep(delay)
+
+    def success(self):
+        with self.lock:
+            self.failures, self.probing = 0, False
+
+    def failure(self, pause):
+        with self.lock:
+            now            = time.monotonic()
+            self.failures += 1
+            self.probing   = False
+            if self.failures >= LLM_BREAKER:
+                if self.failures == LLM_BREAKER or now >= self.paused_until:
+                    bump("llm_breaker_trips")
+                pause = max(pause, LLM_COOLDOWN)
+            self.paused_until = max(self.paused_until, now + pause)
+
+    def settle(self, estimate, used):
+        if used > estimate:
+            self.tokens.take(used - estimate)
+        elif used < estimate:
+            self.tokens.give(estimate - used)
+
+_llm_limiters      = {}
+_llm_limiters_lock = threading.Lock()
+
+def llm_limiter(api_key, rpm=None, tpm=None):
+    with _llm_limiters_lock:
+        limiter = _llm_limiters.pop(api_key, None)
+        if limiter is None:
+            limiter = LLMLimiter(rpm or LLM_RPM, tpm or LLM_TPM)
+        elif rpm or tpm:
+            limiter.configure(rpm or LLM_RPM, tpm or LLM_TPM)
+        _llm_limiters[api_key] = limiter
+        if len(_llm_limiters) > 256:
+            _llm_limiters.pop(next(iter(_llm_limiters)))
+        return limiter
 
 # ─────────────────────────────────────────────────────
-# PAGE FETCHING
+# JOB STATS
 # ─────────────────────────────────────────────────────
-def extract_meta(html):
-    def clean(s):
-        s = re.sub(r"<[^>]+>", " ", s)
-        s = re.sub(r"&amp;", "&", s)
-        s = re.sub(r"&quot;", '"', s)
-        s = re.sub(r"&#39;", "'", s)
-        s = re.sub(r"&[a-z]+;", " ", s)
-        return re.sub(r"\s+", " ", s).strip()
-
-    m = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
-    meta_title = clean(m.group(1)) if m else ""
-    meta_title = re.split(r"\s*[|\u2013\u2014]\s*", meta_title)[0].strip()
-
-    m = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-    if not m:
-        m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+name=["\']description["\']', html, re.IGNORECASE | re.DOTALL)
-    meta_desc = clean(m.group(1)) if m else ""
-
-    if not meta_desc:
-        m = re.search(r'<meta[^>]+property=["\']og:description["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-        if not m:
-            m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+property=["\']og:description["\']', html, re.IGNORECASE | re.DOTALL)
-        meta_desc = clean(m.group(1)) if m else ""
-
-    if not meta_title:
-        m = re.search(r'<meta[^>]+property=["\']og:title["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-        meta_title = clean(m.group(1)) if m else ""
-
-    m = re.search(r"<h1[^>]*>(.*?)</h1>", html, re.IGNORECASE | re.DOTALL)
-    h1 = clean(m.group(1)) if m else ""
-
-    h2s = re.findall(r"<h2[^>]*>(.*?)</h2>", html, re.IGNORECASE | re.DOTALL)
-    h2s = [clean(h) for h in h2s if len(clean(h)) > 3][:6]
-
-    return {
-        "meta_title": meta_title[:200],
-        "meta_desc" : meta_desc[:400],
-        "h1"        : h1[:150],
-        "h2s"       : " | ".join(h2s)[:300] if h2s else "",
-    }
-
-def extract_main_content(html):
-    for tag in ["main", "article"]:
-        pat = re.compile(r"<" + tag + r"[^>]*>(.*?)</" + tag + r">", re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    pat = re.compile(r'<[^>]+role="main"[^>]*>(.*?)</(?:div|section|main)>', re.DOTALL | re.IGNORECASE)
-    m = pat.search(html)
-    if m and len(m.group(1)) > 200:
-        return m.group(1)
-
-    for id_val in ["content", "main", "main-content", "page-content", "article", "primary"]:
-        pat = re.compile(r'<(?:div|section)[^>]+id="' + id_val + r'"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    for cls_val in ["content", "main", "article", "entry-content", "post-content"]:
-        pat = re.compile(r'<(?:div|section)[^>]+class="[^"]*' + cls_val + r'[^"]*"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    return html
-
-def fetch_page(url):
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        if r.status_code != 200:
-            return None
-        raw_html = r.text
-        meta     = extract_meta(raw_html)
-
-        html = raw_html
-        for tag in ["script", "style", "nav", "footer", "header", "aside", "noscript", "iframe", "svg", "form"]:
-            html = re.sub(r"<" + tag + r"[^>]*>.*?</" + tag + r">", " ", html, flags=re.DOTALL | re.IGNORECASE)
-
-        for noise in ["sidebar", "widget", "banner", "promo", "advertisement",
-                      "breadcrumb", "pagination", "related", "social", "share",
-                      "cookie", "popup", "modal", "overlay", "newsletter"]:
-            pat = re.compile(
-                r'<(?:div|section|ul|span)[^>]+(?:class|id)="[^"]*' + noise + r'[^"]*"[^>]*>.*?</(?:div|section|ul|span)>',
-                re.DOTALL | re.IGNORECASE
-            )
-            html = pat.sub(" ", html)
-
-        main_html = extract_main_content(html)
-        body = re.sub(r"<[^>]+>", " ", main_html)
-        body = re.sub(r"\+\d[\d\s\-(). ]{7,20}", " ", body)
-        body = re.sub(r"[A-Fa-f0-9]{40,}", " ", body)
-        body = re.sub(r"\s+", " ", body).strip()
-
-        parts = []
-        if meta["meta_title"]:
-            parts.append(f"META TITLE: {meta['meta_title']}")
-        if meta["meta_desc"]:
-            parts.append(f"META DESCRIPTION: {meta['meta_desc']}")
-        if meta["h1"] and meta["h1"].lower() != meta["meta_title"].lower():
-            parts.append(f"H1: {meta['h1']}")
-        if meta["h2s"]:
-            parts.append(f"H2s: {meta['h2s']}")
-        if body:
-            parts.append(f"CONTENT: {body[:2000]}")
-
-        structured = "\n".join(parts)
-        return structured if len(structured) > 100 else None
-    except:
-        return None
+def llm_stats_msg(delta, elapsed):
+    requests_made = delta.get("llm_requests", 0)
+    msg = (f"LLM: {requests_made} requests · {delta.get('llm_tokens', 0) / 1000:.1f}k tokens"
+           f" · {requests_made * 60 / max(elapsed, 0.001):.0f} req/min")
+    if delta.get("llm_batch_jobs"):
+        msg += f" · {delta['llm_batch_jobs']} Batch API jobs"
+    if delta.get("llm_batches"):
+        msg += f" · {delta['llm_batches']} batched prompts ({delta.get('llm_batch_fallbacks', 0)} pages fell back to single calls)"
+    if delta.get("llm_wait_ms"):
+        msg += f" · {delta['llm_wait_ms'] / 1000:.1f}s worker time held back by rate limits"
+    if delta.get("llm_retries"):
+        msg += f" · {delta['llm_retries']} retries ({delta.get('llm_rate_limited', 0)} rate limited)"
+    if delta.get("llm_throttled_ms"):
+        msg += f" · {delta['llm_throttled_ms'] / 1000:.1f}s worker time throttled by API errors"
+    if delta.get("llm_breaker_trips"):
+        msg += f" · circuit breaker opened {delta['llm_breaker_trips']}×"
+    return msg
 
 # ─────────────────────────────────────────────────────
 # SUMMARIZATION
 # ─────────────────────────────────────────────────────
-SUMMARIZE_PROMPT = """You are a technical writer creating llms.txt entries. These entries are read by AI crawlers to understand what a page contains and who it is for — so precision and distinctiveness matter far more than marketing language.
-
-Read the page content carefully and return ONLY a JSON object.
+SUMMARIZE_ROLE = "You are a technical writer creating llms.txt entries. These entries are read by AI crawlers to understand what a page contains and who it is for — so precision and distinctiveness matter far more than marketing language."
 
-STEP 1 — Classify page type:
+SUMMARIZE_RULES = """STEP 1 — Classify page type:
 feature-list, pricing, download, support, demo, release-notes, documentation, blog, faq, about, legal, other
 
 STEP 2 — Infer primary audience from the language and content of the page:
@@ -240,7 +328,13 @@ UNIVERSAL DESCRIPTION RULES:
 - No comma-separated lists of more than 3 items.
 - No filler openers: never start with "This page", "The page", "A guide", "A list", "Users to", "Covers"
 - No nav links, sidebar content, phone numbers, or footer content.
-- Active voice, present tense.
+- Active voice, present tense."""
+
+SUMMARIZE_PROMPT = SUMMARIZE_ROLE + """
+
+Read the page content carefully and return ONLY a JSON object.
+
+""" + SUMMARIZE_RULES + """
 
 JSON FORMAT — double quotes only, no trailing commas, raw JSON only:
 {{"title": "...", "description": "..."}}
@@ -249,6 +343,18 @@ URL: {url}
 Page content:
 {content}"""
 
+BATCH_SUMMARIZE_PROMPT = SUMMARIZE_ROLE + """
+
+Each page below is separate. Read every page carefully, summarise each one independently — never mix facts between pages — and return ONLY a JSON object whose "pages" array has exactly one entry per page, in the order given.
+
+""" + SUMMARIZE_RULES + """
+
+JSON FORMAT — double quotes only, no trailing commas, raw JSON only:
+{{"pages": [{{"url": "<page URL exactly as given>", "title": "...", "description": "..."}}]}}
+
+PAGES:
+{pages}"""
+
 RESCORE_PROMPT = """You are evaluating an llms.txt description. Score 1-5 on specificity and rewrite if needed.
 
 1 = Generic filler, comma-list dump, or starts with "This page / The page / A guide"
@@ -279,35 +385,199 @@ Page B current description: {desc_b}
 
 Return ONLY JSON: {{"description": "<rewritten description for Page B>"}}"""
 
-def summarize(url, content, api_key, progress_q=None):
+async def summarize(url, content, api_key, progress_q=None):
     snippet = content[:3500].strip()
     if not snippet:
         return None
     for attempt in range(3):
         try:
-            raw = call_llm(SUMMARIZE_PROMPT.format(url=url, content=snippet), api_key)
-            if raw.startswith("```"):
-                raw = raw.split("```")[1]
-                if raw.startswith("json"):
-                    raw = raw[4:]
-            result = json.loads(raw.strip())
-            if "title" in result and "description" in result:
+            raw    = await acall_llm(SUMMARIZE_PROMPT.format(url=url, content=snippet), api_key, stage="summarize", fresh=attempt > 0,
+                                    schema=llm_json.SUMMARY_SCHEMA)
+            result = parse_reply(raw)
+            if isinstance(result, dict) and "title" in result and "description" in result:
                 return result
+        except ValueError:
+            continue
         except Exception as e:
-            if attempt < 2:
-                time.sleep(0.5)
-            elif progress_q:
+            if progress_q:
                 progress_q.put({"type": "stage", "msg": f"API error: {str(e)[:120]}", "pct": 0})
+            return None
     return None
 
-def rescore_and_fix(url, content, description, api_key):
+async def summarize_batch(batch, api_key, progress_q=None):
+    blocks = [f"=== PAGE {i} ===\nURL: {page['url']}\nPage content:\n{page['content'][:3500].strip()}"
+              for i, page in enumerate(batch, 1)]
+    try:
+        raw   = await acall_llm(BATCH_SUMMARIZE_PROMPT.format(pages="\n\n".join(blocks)), api_key, max_tokens=250 * len(batch),
+                               stage="batch", schema=llm_json.BATCH_SCHEMA)
+        items = parse_reply(raw)
+        if isinstance(items, dict):
+            items = items.get("pages", [])
+    except Exception as e:
+        if progress_q:
+            progress_q.put({"type": "stage", "msg": f"Batch failed, summarising pages one by one: {str(e)[:120]}", "pct": 0})
+        items = []
+
+    urls, found = {page["url"].rstrip("/"): page["url"] for page in batch}, {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and "title" in item and "description" in item:
+            url = urls.get(str(item.get("url", "")).strip().rstrip("/"))
+            if url:
+                found[url] = {"title": item["title"], "description": item["description"]}
+    bump("llm_batches")
+    bump("llm_batch_fallbacks", len(batch) - len(found))
+    return found
+
+def batch_pages(pages, size):
+    batch, tokens = [], 0
+    for page in pages:
+        cost = len(page["content"][:3500]) // 4
+        if batch and (len(batch) >= size or tokens + cost > LLM_BATCH_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(page)
+        tokens += cost
+    if batch:
+        yield batch
+
+def summarize_pages(pages, api_key, progress_q=None, report=True, batch=False, on_result=None):
+    return llm_backends.run(summarize_all(pages, api_key, progress_q, report, batch, on_result))
+
+async def summarize_all(pages, api_key, progress_q=None, report=True, batch=False, on_result=None):
+    results = {}
+    done    = 0
+
+    async def worker(group):
+        nonlocal done
+        found = await summarize_batch(group, api_key, progress_q) if len(group) > 1 else {}
+        for page in group:
+            result = found.get(page["url"]) or await summarize(page["url"], page["content"], api_key, progress_q)
+            if result and on_result:
+                on_result(page["url"], result)
+            results[page["url"]] = result
+            done += 1
+            if progress_q and report:
+                progress_q.put({"type": "summarize", "current": done, "total": len(pages), "url": page["url"], "ok": result is not None})
+
+    await llm_backends.gather_limited([worker(group) for group in batch_pages(pages, LLM_BATCH_PAGES if batch else 1)], LLM_WORKERS)
+    return results
+
+def batch_request(custom_id, prompt):
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": {
+        "model": MODEL, "messages": [{"role": "user", "content": prompt}], "temperature": 0.2, "max_tokens": 600,
+        "response_format": llm_backends.openai_response_format(llm_json.SUMMARY_SCHEMA),
+    }})
+
+BATCH_FINAL = ("completed", "failed", "expired", "cancelled")
+
+def batch_api_call(fn, *args, **kwargs):
+    for attempt in range(LLM_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            status = e.status_code if isinstance(e, APIStatusError) else None
+            if attempt == LLM_RETRIES or not retryable(e, status):
+                raise
+            bump("llm_retries")
+            time.sleep(backoff(attempt))
+
+# Requests are identified by their cache key, so the output of a batch submitted
+# by an earlier (failed or restarted) job can be matched to pages again: pass its
+# ids as `resume` to collect it instead of submitting a new batch.
+def summarize_via_batch_api(pages, api_key, progress_q=None, on_result=None, resume=()):
+    client, batches = llm_client(api_key), []
+    prompts = [SUMMARIZE_PROMPT.format(url=page["url"], content=page["content"][:3500].strip()) for page in pages]
+    keys    = {llm_cache.cache_key(MODEL, prompt, 0.2): i for i, prompt in enumerate(prompts)}
+    results = {}
+
+    def collect(i, raw):
+        try:
+            result = parse_reply(raw)
+            if isinstance(result, dict) and "title" in result and "description" in result:
+                results[pages[i]["url"]] = result
+                if on_result:
+                    on_result(pages[i]["url"], result)
+        except Exception:
+            pass
+
+    todo = []
+    for i, prompt in enumerate(prompts):
+        cached = llm_cache.lookup(MODEL, prompt, 0.2)
+        if llm_cache.LLM_CACHE_DB:
+            bump(llm_cache.stat_key("summarize", cached is not None))
+        if cached is not None:
+            collect(i, cached)
+        else:
+            todo.append(i)
+
+    for batch_id in resume:
+        batches.append(batch_api_call(client.batches.retrieve, batch_id))
+        if progress_q:
+            progress_q.put({"type": "stage", "msg": f"Resuming batch {batch_id} ({batches[-1].status})", "pct": 34})
+
+    for start in range(0, 0 if resume else len(todo), BATCH_API_SIZE):
+        lines  = [batch_request(llm_cache.cache_key(MODEL, prompts[i], 0.2), prompts[i]) for i in todo[start:start + BATCH_API_SIZE]]
+        upload = client.files.create(file=("summaries.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch  = client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h")
+        batches.append(batch)
+        bump("llm_batch_jobs")
+        if progress_q:
+            progress_q.put({"type": "stage", "msg": f"Submitted batch {batch.id} with {len(lines)} requests", "pct": 34})
+
+    while any(b.status not in BATCH_FINAL for b in batches):
+        time.sleep(BATCH_API_POLL)
+        client = llm_client(api_key)
+        try:
+            batches = [b if b.status in BATCH_FINAL else batch_api_call(client.batches.retrieve, b.id) for b in batches]
+        except Exception as e:
+            status = e.status_code if isinstance(e, APIStatusError) else None
+            ids    = ", ".join(b.id for b in batches)
+            if not retryable(e, status):
+                raise RuntimeError(f"Batch API polling failed ({str(e)[:120]}). Resume with batch ids: {ids}") from e
+            if progress_q:
+                progress_q.put({"type": "stage", "msg": f"Batch status check failed ({str(e)[:80]}), still waiting on {ids}", "pct": 34})
+            continue
+        if progress_q:
+            counts = [b.request_counts for b in batches if b.request_counts]
+            progress_q.put({"type": "batch", "total": len(todo),
+                            "status": " / ".join(sorted({b.status for b in batches})),
+                            "completed": sum(c.completed for c in counts), "failed": sum(c.failed for c in counts)})
+
+    client = llm_client(api_key)
+    for batch in batches:
+        if batch.status != "completed" and progress_q:
+            progress_q.put({"type": "stage", "msg": f"Batch {batch.id} ended as {batch.status}", "pct": 79})
+        if not batch.output_file_id:
+            continue
+        try:
+            output = batch_api_call(client.files.content, batch.output_file_id).text
+        except Exception as e:
+            if progress_q:
+                progress_q.put({"type": "stage", "msg": f"Could not download the results of batch {batch.id} ({str(e)[:80]}); resume with this batch id", "pct": 79})
+            continue
+        for line in output.splitlines():
+            try:
+                item     = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") != 200 or item.get("custom_id") not in keys:
+                    continue
+                i   = keys[item["custom_id"]]
+                raw = response["body"]["choices"][0]["message"]["content"].strip()
+                llm_cache.store(MODEL, prompts[i], 0.2, raw)
+                bump("llm_requests")
+                bump("llm_tokens", (response["body"].get("usage") or {}).get("total_tokens", 0))
+            except Exception:
+                continue
+            collect(i, raw)
+    return results
+
+async def rescore_and_fix(url, content, description, api_key):
     try:
-        raw = call_llm(RESCORE_PROMPT.format(url=url, content=content[:1500], description=description), api_key)
-        if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
-                raw = raw[4:]
-        result = json.loads(raw.strip())
+        raw    = await acall_llm(RESCORE_PROMPT.format(url=url, content=content[:1500], description=description), api_key,
+                                 stage="rescore", schema=llm_json.RESCORE_SCHEMA)
+        result = parse_reply(raw)
+        if not isinstance(result, dict):
+            return 3, description
         desc   = result.get("description", description).strip()
         return int(result.get("score", 3)), desc if desc else description
     except:
@@ -363,9 +633,39 @@ def description_similarity(a, b):
         return 0.0
     return len(words_a & words_b) / min(len(words_a), len(words_b))
 
-def fix_quality(summaries, page_map, api_key, progress_q=None):
-    total = len(summaries)
+async def rescore_all(items, page_map, api_key, progress_q=None):
+    done, fixed = 0, 0
+
+    async def rescore(item):
+        nonlocal done, fixed
+        _, new_desc = await rescore_and_fix(item["url"], page_map[item["url"]], item["description"], api_key)
+        if new_desc != item["description"]:
+            item["description"] = new_desc
+            fixed += 1
+        done += 1
+        if progress_q and (done % 5 == 0 or done == len(items)):
+            progress_q.put({"type": "qa_rescore", "current": done, "total": len(items)})
 
+    await llm_backends.gather_limited([rescore(item) for item in items], LLM_WORKERS)
+    return fixed
+
+async def differentiate(item_a, item_b, content_b, api_key):
+    try:
+        raw = await acall_llm(DIFFERENTIATE_PROMPT.format(
+            url_a=item_a["url"], desc_a=item_a["description"],
+            url_b=item_b["url"], content_b=content_b[:2000],
+            desc_b=item_b["description"]
+        ), api_key, stage="differentiate", schema=llm_json.DIFFERENTIATE_SCHEMA)
+        result   = parse_reply(raw)
+        new_desc = result.get("description", "").strip() if isinstance(result, dict) else ""
+        if new_desc and len(new_desc) > 60:
+            item_b["description"] = new_desc
+            return True
+    except:
+        pass
+    return False
+
+def fix_quality(summaries, page_map, api_key, progress_q=None):
     # Phase 1 — structural fixes (no LLM)
     if progress_q:
         progress_q.put({"type": "stage", "msg": "QA Phase 1 — Structural fixes", "pct": 86})
@@ -394,18 +694,8 @@ def fix_quality(summaries, page_map, api_key, progress_q=None):
     if progress_q:
         progress_q.put({"type": "stage", "msg": "QA Phase 2 — LLM scoring & rewrite", "pct": 90})
 
-    rescore_fixed = 0
-    for i, item in enumerate(summaries):
-        score, _ = score_description(item["description"])
-        if score <= 3:
-            content = page_map.get(item["url"], "")
-            if content:
-                _, new_desc = rescore_and_fix(item["url"], content, item["description"], api_key)
-                if new_desc != item["description"]:
-                    item["description"] = new_desc
-                    rescore_fixed += 1
-            if progress_q and i % 5 == 0:
-                progress_q.put({"type": "qa_rescore", "current": i + 1, "total": total})
+    weak          = [item for item in summaries if score_description(item["description"])[0] <= 3 and page_map.get(item["url"])]
+    rescore_fixed = llm_backends.run(rescore_all(weak, page_map, api_key, progress_q))
 
     if progress_q:
         progress_q.put({"type": "qa_result", "fixed": rescore_fixed, "dups": 0})
@@ -418,36 +708,76 @@ def fix_quality(summaries, page_map, api_key, progress_q=None):
     for item in summaries:
         domain_groups[urlparse(item["url"]).netloc].append(item)
 
+    # Rewrites for one item_a only touch the later siblings, so each row of the
+    # comparison runs concurrently without changing the result.
     dedup_fixed = 0
     for items in domain_groups.values():
         for i in range(len(items)):
-            for j in range(i + 1, len(items)):
-                if description_similarity(items[i]["description"], items[j]["description"]) >= 0.70:
-                    content_b = page_map.get(items[j]["url"], "")
-                    if not content_b:
-                        continue
-                    try:
-                        raw = call_llm(DIFFERENTIATE_PROMPT.format(
-                            url_a=items[i]["url"], desc_a=items[i]["description"],
-                            url_b=items[j]["url"], content_b=content_b[:2000],
-                            desc_b=items[j]["description"]
-                        ), api_key)
-                        if raw.startswith("```"):
-                            raw = raw.split("```")[1]
-                            if raw.startswith("json"):
-                                raw = raw[4:]
-                        new_desc = json.loads(raw.strip()).get("description", "").strip()
-                        if new_desc and len(new_desc) > 60:
-                            items[j]["description"] = new_desc
-                            dedup_fixed += 1
-                    except:
-                        pass
+            similar = [item for item in items[i + 1:] if page_map.get(item["url"])
+                       and description_similarity(items[i]["description"], item["description"]) >= 0.70]
+            if similar:
+                fixed = llm_backends.run(llm_backends.gather_limited(
+                    [differentiate(items[i], item, page_map[item["url"]], api_key) for item in similar], LLM_WORKERS))
+                dedup_fixed += sum(fixed)
 
     if progress_q:
         progress_q.put({"type": "qa_result", "fixed": dedup_fixed, "dups": 0})
 
     return summaries
 
+# ─────────────────────────────────────────────────────
+# INCREMENTAL STATE
+# ─────────────────────────────────────────────────────
+def state_connect():
+    conn = sqlite3.connect(STATE_DB, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+        url          TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        title        TEXT NOT NULL,
+        description  TEXT NOT NULL,
+        updated      REAL NOT NULL,
+        lastmod      TEXT
+    )""")
+    if "lastmod" not in {row[1] for row in conn.execute("PRAGMA table_info(pages)")}:
+        conn.execute("ALTER TABLE pages ADD COLUMN lastmod TEXT")
+    return conn
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def load_page_records(urls):
+    urls, records = list(urls), {}
+    with closing(state_connect()) as conn:
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            rows  = conn.execute(
+                f"SELECT url, content_hash, title, description FROM pages WHERE url IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for url, digest, title, description in rows:
+                records[url] = {"content_hash": digest, "title": title, "description": description}
+    return records
+
+def save_page_records(summaries, page_map, lastmods):
+    now  = time.time()
+    rows = [(item["url"], content_hash(page_map[item["url"]]), item["title"], item["description"], now, lastmods.get(item["url"]))
+            for item in summaries if item["url"] in page_map]
+    with closing(state_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO pages (url, content_hash, title, description, updated, lastmod) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+def skip_unchanged(urls, lastmods, skipped, order):
+    with closing(state_connect()) as conn:
+        for url in urls:
+            order[url] = len(order)
+            row        = conn.execute("SELECT title, description, lastmod FROM pages WHERE url = ?", (url,)).fetchone()
+            stored     = parse_lastmod(row[2]) if row else None
+            current    = parse_lastmod(lastmods.get(url))
+            if stored and current and current <= stored:
+                skipped[url] = {"url": url, "title": row[0], "description": row[1]}
+                continue
+            yield url
+
 # ─────────────────────────────────────────────────────
 # OUTPUT
 # ─────────────────────────────────────────────────────
@@ -462,6 +792,24 @@ def generate_llms_txt(summaries):
             lines.append("")
     return "\n".join(lines)
 
+# Entries are published as soon as a page is summarised ("provisional") and
+# again once QA has finished with them ("final"), so a running job can be
+# previewed and downloaded. updates is an append-only log the /entries stream
+# replays from any offset.
+def publish_entry(job, item, status):
+    entry = {"url": item["url"], "title": item.get("title", ""), "description": item.get("description", ""), "status": status}
+    with job["changed"]:
+        job["entries"][entry["url"]] = entry
+        job["updates"].append(entry)
+        job["changed"].notify_all()
+
+def partial_llms_txt(job):
+    with job["changed"]:
+        entries = list(job["entries"].values())
+    order = job["order"]
+    entries.sort(key=lambda entry: order.get(entry["url"], len(order)))
+    return generate_llms_txt(entries)
+
 # ─────────────────────────────────────────────────────
 # HTML UI
 # ─────────────────────────────────────────────────────
@@ -529,6 +877,15 @@ HTML = """<!DOCTYPE html>
     }
     .sitemap-input:focus { border-color: #6c47ff; }
     .sitemap-hint { font-size: 11px; color: #aaa; margin-top: -16px; margin-bottom: 20px; }
+    .option-row {
+      display: flex; align-items: center; gap: 8px; margin-bottom: 12px;
+      font-size: 12px; font-weight: 500; color: #555; cursor: pointer;
+    }
+    .limit-input {
+      width: 90px; padding: 6px 8px; border: 1.5px solid #e0e0e0;
+      border-radius: 8px; font-size: 12px; outline: none;
+    }
+    .batch-ids-input { width: 200px; }
     #submitBtn {
       width: 100%; padding: 14px; background: #6c47ff; color: #fff;
       border: none; border-radius: 10px; font-size: 15px; font-weight: 700;
@@ -575,6 +932,20 @@ HTML = """<!DOCTYPE html>
     .log-line.stage   { color: #60cdff; font-weight: bold; }
     .log-line.error   { color: #f87171; }
     .log-line.qa      { color: #c084fc; }
+    .partial-box { display: none; margin-top: 16px; border: 1px solid #e5e7eb; border-radius: 10px; overflow: hidden; }
+    .partial-box.show { display: block; }
+    .partial-header {
+      display: flex; justify-content: space-between; align-items: center;
+      background: #f9fafb; padding: 8px 14px; font-size: 11px; font-weight: 700; color: #555;
+    }
+    .partial-btn {
+      background: #fff; color: #6c47ff; border: 1.5px solid #6c47ff; border-radius: 8px;
+      padding: 4px 10px; font-size: 11px; font-weight: 700; cursor: pointer;
+    }
+    .partial-preview {
+      max-height: 220px; overflow-y: auto; padding: 10px 14px; margin: 0;
+      font-family: monospace; font-size: 11px; line-height: 1.6; color: #333; white-space: pre-wrap;
+    }
     .result-box {
       display: none; margin-top: 20px; padding: 18px 20px;
       background: #f0fdf4; border: 1.5px solid #6ee7b7;
@@ -673,14 +1044,28 @@ HTML = """<!DOCTYPE html>
 
     <div class="tab-panel" id="panel-sitemapfile" style="display:none">
       <div class="upload-area" id="uploadAreaXml">
-        <input type="file" id="sitemap_file" accept=".xml">
+        <input type="file" id="sitemap_file" accept=".xml,.gz">
         <div class="upload-icon">🗺</div>
         <div class="upload-text">Click to upload sitemap.xml</div>
-        <div class="upload-hint">Sitemap index supported</div>
+        <div class="upload-hint">Sitemap index and .xml.gz supported</div>
         <div class="file-name" id="fileNameXml"></div>
       </div>
     </div>
 
+    {% if not server_has_key %}
+    <label class="option-row">Rate limit
+      <input class="limit-input" type="number" id="llm_rpm" min="1" placeholder="{{ llm_rpm }}"> requests/min
+      <input class="limit-input" type="number" id="llm_tpm" min="1" placeholder="{{ llm_tpm }}"> tokens/min
+    </label>
+    {% endif %}
+    <label class="option-row"><input type="checkbox" id="incremental"> Reuse summaries for pages unchanged since the last run</label>
+    <label class="option-row"><input type="checkbox" id="use_lastmod"> Skip sitemap pages whose lastmod hasn't changed since the last run</label>
+    <label class="option-row"><input type="checkbox" id="batch_api"> Use the OpenAI Batch API (half price, results within 24h — for very large jobs)</label>
+    <label class="option-row">Resume batches
+      <input class="limit-input batch-ids-input" type="text" id="batch_ids" placeholder="batch_abc123, …"> collect earlier Batch API results instead of submitting new ones
+    </label>
+    <label class="option-row"><input type="checkbox" id="batch_mode"> Summarise several pages per request (fewer, larger prompts)</label>
+
     <button type="submit" id="submitBtn">Generate llms.txt</button>
   </form>
 
@@ -706,6 +1091,13 @@ HTML = """<!DOCTYPE html>
       <div class="log-header">LIVE LOG</div>
       <div class="log-area" id="logArea"></div>
     </div>
+    <div class="partial-box" id="partialBox">
+      <div class="partial-header">
+        <span id="partialCount"></span>
+        <button type="button" class="partial-btn" id="partialBtn">⬇ Download partial llms.txt</button>
+      </div>
+      <pre class="partial-preview" id="partialPreview"></pre>
+    </div>
     <div class="result-box" id="resultBox">
       <div class="result-info">🎉 llms.txt is ready!<span id="resultSub"></span></div>
       <button class="download-btn" id="downloadBtn">⬇ Download llms.txt</button>
@@ -718,7 +1110,9 @@ HTML = """<!DOCTYPE html>
 <script>
   let resultBlob = null
   let activeTab  = 'csv'
+  let partialUrl = null
   const STAGES   = ['fetch', 'summarize', 'qa', 'generate']
+  const PREVIEW_MAX = 50
 
   function switchTab(btn, tab) {
     activeTab = tab
@@ -807,6 +1201,7 @@ HTML = """<!DOCTYPE html>
     document.getElementById('logArea').innerHTML = ''
     document.getElementById('resultBox').classList.remove('show')
     document.getElementById('errorBox').classList.remove('show')
+    document.getElementById('partialBox').classList.remove('show')
     document.getElementById('progressFill').style.width = '0%'
     document.getElementById('spinner').style.display    = ''
     resultBlob = null
@@ -822,6 +1217,15 @@ HTML = """<!DOCTYPE html>
     const formData = new FormData()
     formData.set('input_mode', activeTab)
     if (apiKey) formData.set('api_key', apiKey)
+    if (apiKeyInput) {
+      formData.set('llm_rpm', document.getElementById('llm_rpm').value.trim())
+      formData.set('llm_tpm', document.getElementById('llm_tpm').value.trim())
+    }
+    if (document.getElementById('incremental').checked) formData.set('incremental', '1')
+    if (document.getElementById('use_lastmod').checked) formData.set('use_lastmod', '1')
+    if (document.getElementById('batch_mode').checked)  formData.set('batch_mode', '1')
+    if (document.getElementById('batch_api').checked)   formData.set('batch_api', '1')
+    formData.set('batch_ids', document.getElementById('batch_ids').value.trim())
     if (activeTab === 'csv')         formData.set('csv_file', document.getElementById('csv_file').files[0])
     if (activeTab === 'sitemap')     formData.set('sitemap_url', document.getElementById('sitemap_url').value.trim())
     if (activeTab === 'sitemapfile') formData.set('sitemap_file', document.getElementById('sitemap_file').files[0])
@@ -836,7 +1240,28 @@ HTML = """<!DOCTYPE html>
       btn.disabled = false; btn.textContent = 'Generate llms.txt'; return
     }
 
-    let evtSource = null, sseRetries = 0
+    partialUrl = '/download/' + jobId + '?partial=1'
+    const entries = new Map()
+    let renderTimer = null
+    function renderPartial() {
+      renderTimer = null
+      const all   = [...entries.values()]
+      const final = all.filter(e => e.status === 'final').length
+      document.getElementById('partialCount').textContent =
+        `PARTIAL LLMS.TXT · ${all.length} entries (${final} final · ${all.length - final} provisional)`
+      document.getElementById('partialPreview').textContent = all.slice(-PREVIEW_MAX)
+        .map(e => `- Source: ${e.url}\\n  Title: ${e.title}\\n  Description: ${e.description}\\n`).join('\\n')
+      document.getElementById('partialBox').classList.add('show')
+    }
+    const entrySource = new EventSource('/entries/' + jobId)
+    entrySource.onmessage = function(e) {
+      const d = JSON.parse(e.data)
+      if (d.type === 'end') { entrySource.close(); if (entries.size) renderPartial(); return }
+      if (d.type !== 'entry') return
+      entries.set(d.url, d)
+      if (!renderTimer) renderTimer = setTimeout(renderPartial, 500)
+    }
+    let evtSource = null, sseRetries = 0, lastBatchStatus = null
     const MAX_RETRIES = 20
 
     function connectSSE() {
@@ -856,12 +1281,20 @@ HTML = """<!DOCTYPE html>
 
         } else if (d.type === 'fetch') {
           setProgress('Fetching pages', Math.round((d.current/d.total)*28)+4, `${d.current} / ${d.total}`, d.url)
-          addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}`, d.ok?'success':'warning')
+          addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}${d.rps ? ` · ${d.rps} req/s` : ''}`, d.ok?'success':'warning')
 
         } else if (d.type === 'summarize') {
           setProgress('Summarising with GPT-4o-mini', Math.round((d.current/d.total)*46)+33, `${d.current} / ${d.total}`, d.url)
           addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}`, d.ok?'success':'warning')
 
+        } else if (d.type === 'batch') {
+          setProgress(`Batch ${d.status}`, Math.round(((d.completed + d.failed)/d.total)*46)+33, `${d.completed} / ${d.total}`, d.failed ? `${d.failed} failed` : '')
+          if (d.status !== lastBatchStatus) addLog(`  ↳ Batch ${d.status} · ${d.completed}/${d.total} done`, 'info')
+          lastBatchStatus = d.status
+
+        } else if (d.type === 'stats') {
+          addLog('  ↳ ' + d.msg, 'info')
+
         } else if (d.type === 'qa_result') {
           if (d.fixed > 0 || d.dups > 0) addLog(`  ↳ Fixed ${d.fixed} descriptions · ${d.dups} duplicate titles resolved`, 'qa')
 
@@ -906,6 +1339,11 @@ HTML = """<!DOCTYPE html>
     connectSSE()
   })
 
+  document.getElementById('partialBtn')?.addEventListener('click', function() {
+    if (!partialUrl) return
+    const a = document.createElement('a')
+    a.href = partialUrl; a.click()
+  })
   document.getElementById('downloadBtn')?.addEventListener('click', function() {
     if (!resultBlob) return
     const url = URL.createObjectURL(resultBlob)
@@ -947,18 +1385,40 @@ def logout():
 def index():
     if not is_authenticated():
         return render_template_string(HTML, needs_login=True, login_error=False, server_has_key=bool(OPENAI_API_KEY))
-    return render_template_string(HTML, needs_login=False, login_error=False, server_has_key=bool(OPENAI_API_KEY))
+    return render_template_string(HTML, needs_login=False, login_error=False, server_has_key=bool(OPENAI_API_KEY),
+                                  llm_rpm=LLM_RPM, llm_tpm=LLM_TPM)
 
 @app.route("/start", methods=["POST"])
 def start():
     if not is_authenticated():
         return jsonify({"error": "Not authenticated"}), 401
 
-    api_key = request.form.get("api_key", "").strip() or OPENAI_API_KEY
+    user_key = request.form.get("api_key", "").strip()
+    api_key  = user_key or OPENAI_API_KEY
     if not api_key:
         return jsonify({"error": "No OpenAI API key provided"}), 400
+    # Limits are per key, so a form may only set them for a key its user brought;
+    # the server's own key always runs at LLM_RPM / LLM_TPM.
+    rpm = request.form.get("llm_rpm", "").strip()
+    tpm = request.form.get("llm_tpm", "").strip()
+    if user_key and user_key != OPENAI_API_KEY:
+        llm_limiter(api_key, int(rpm) if rpm.isdigit() else None, int(tpm) if tpm.isdigit() else None)
+
+    token = job_stats.set(Counter())
+    try:
+        return start_job(api_key)
+    finally:
+        job_stats.reset(token)
 
+def start_job(api_key):
+    stats_before = stats_snapshot()
     input_mode = request.form.get("input_mode", "csv")
+    incremental  = request.form.get("incremental") == "1"
+    batch_mode   = request.form.get("batch_mode") == "1"
+    batch_api    = request.form.get("batch_api") == "1"
+    batch_ids    = request.form.get("batch_ids", "").replace(",", " ").split()
+    use_lastmod  = request.form.get("use_lastmod") == "1"
+    lastmods     = {}
     urls_raw   = []
 
     if input_mode == "csv":
@@ -971,71 +1431,124 @@ def start():
         sitemap_url = request.form.get("sitemap_url", "").strip()
         if not sitemap_url:
             return jsonify({"error": "No sitemap URL provided"}), 400
-        urls_raw, err = parse_sitemap(sitemap_url, is_file=False)
+        entries, err = parse_sitemap(sitemap_url, is_file=False)
         if err:
             return jsonify({"error": f"Sitemap error: {err}"}), 400
+        urls_raw = sitemap_locs(entries, lastmods)
 
     elif input_mode == "sitemapfile":
         if "sitemap_file" not in request.files:
             return jsonify({"error": "No sitemap file uploaded"}), 400
-        urls_raw, err = parse_sitemap(request.files["sitemap_file"].stream.read(), is_file=True)
+        entries, err = parse_sitemap(request.files["sitemap_file"].stream.read(), is_file=True)
         if err:
             return jsonify({"error": f"Sitemap parse error: {err}"}), 400
+        urls_raw = sitemap_locs(entries, lastmods)
 
-    seen = set()
-    urls = [u for u in (clean_url(u) for u in urls_raw) if not (u in seen or seen.add(u))]
-    if not urls:
-        return jsonify({"error": "No valid URLs found"}), 400
+    if isinstance(urls_raw, list):
+        urls = list(unique_urls(urls_raw))
+        if not urls:
+            return jsonify({"error": "No valid URLs found"}), 400
+    else:
+        urls  = unique_urls(urls_raw)
+        first = next(urls, None)
+        if first is None:
+            return jsonify({"error": "No valid URLs found"}), 400
+        urls = chain([first], urls)
 
     job_id       = str(int(time.time() * 1000))
     q            = queue.Queue()
-    jobs[job_id] = {"queue": q, "result": None, "done": False}
+    job          = {"queue": q, "result": None, "done": False, "entries": {}, "updates": [], "order": {},
+                    "changed": threading.Condition()}
+    jobs[job_id] = job
+
+    def publish(url, result):
+        publish_entry(job, {"url": url, **result}, "provisional")
 
     def run_pipeline():
         try:
-            total = len(urls)
-            q.put({"type": "stage", "msg": f"{total} URLs loaded", "pct": 2})
+            if isinstance(urls, list):
+                q.put({"type": "stage", "msg": f"{len(urls)} URLs loaded", "pct": 2})
+            else:
+                q.put({"type": "stage", "msg": "Expanding sitemap — pages are fetched as URLs arrive", "pct": 2})
 
             # Fetch
+            skipped, order, source = {}, {}, urls
+            if use_lastmod and not isinstance(urls, list):
+                source = skip_unchanged(urls, lastmods, skipped, order)
+
             q.put({"type": "stage", "msg": "Fetching pages", "pct": 5})
-            pages = []
-            for i, url in enumerate(urls, 1):
-                content = fetch_page(url)
-                ok      = content is not None
-                if ok:
-                    pages.append({"url": url, "content": content})
-                q.put({"type": "fetch", "current": i, "total": total, "url": url, "ok": ok})
-                time.sleep(0.1)
-
-            if not pages:
+            pages = fetch_pages(source, q)
+            delta = stats_since(stats_before)
+            rates = domain_rates(p["url"] for p in pages)
+            q.put({"type": "stats", "stage": "fetch", "stats": delta, "rps": rates, "msg": fetch_stats_msg(delta, rates)})
+
+            if skipped:
+                q.put({"type": "stage", "msg": f"Skipped {len(skipped)} pages whose sitemap lastmod is unchanged", "pct": 32})
+            if not pages and not skipped:
                 q.put({"type": "error", "msg": "Could not fetch any pages"}); return
 
-            page_map = {p["url"]: p["content"] for p in pages}
+            page_map     = {p["url"]: p["content"] for p in pages}
+            records      = load_page_records(page_map) if incremental else {}
+            job["order"] = order or {url: i for i, url in enumerate(page_map)}
 
             # Summarize
+            summaries, failed, pending = list(skipped.values()), [], []
+            for page in pages:
+                record = records.get(page["url"])
+                if record and record["content_hash"] == content_hash(page["content"]):
+                    summaries.append({"url": page["url"], "title": record["title"], "description": record["description"]})
+                else:
+                    pending.append(page)
+            for item in summaries:
+                publish_entry(job, item, "provisional")
+            reused = len(summaries) - len(skipped)
+            if reused:
+                q.put({"type": "stage", "msg": f"Reusing {reused} unchanged summaries", "pct": 33})
+
             q.put({"type": "stage", "msg": "Summarising with GPT-4o-mini", "pct": 33})
-            summaries, failed = [], []
-            for i, page in enumerate(pages, 1):
-                result = summarize(page["url"], page["content"], api_key, q)
+            llm_before, started = stats_snapshot(), time.time()
+            if batch_ids and pending:
+                results = summarize_via_batch_api(pending, api_key, q, on_result=publish, resume=batch_ids)
+            elif batch_api and pending:
+                q.put({"type": "stage", "msg": f"Submitting {len(pending)} pages to the OpenAI Batch API", "pct": 33})
+                results = summarize_via_batch_api(pending, api_key, q, on_result=publish)
+            else:
+                results = summarize_pages(pending, api_key, q, batch=batch_mode, on_result=publish)
+            for page in pending:
+                result = results.get(page["url"])
                 if result:
                     summaries.append({"url": page["url"], "title": result.get("title", ""), "description": result.get("description", "")})
                 else:
                     failed.append(page)
-                q.put({"type": "summarize", "current": i, "total": len(pages), "url": page["url"], "ok": result is not None})
 
             if failed:
                 q.put({"type": "stage", "msg": f"Retrying {len(failed)} failed pages", "pct": 80})
+                results = summarize_pages(failed, api_key, q, report=False, on_result=publish)
                 for page in failed:
-                    result = summarize(page["url"], page["content"], api_key, q)
+                    result = results.get(page["url"])
                     if result:
                         summaries.append({"url": page["url"], "title": result.get("title", ""), "description": result.get("description", "")})
+            if pending:
+                delta = stats_since(llm_before)
+                q.put({"type": "stats", "stage": "summarize", "stats": delta, "msg": llm_stats_msg(delta, time.time() - started)})
 
             if not summaries:
                 q.put({"type": "error", "msg": "Could not summarize any pages"}); return
 
+            order = job["order"]
+            summaries.sort(key=lambda item: order[item["url"]])
+
             # QA
             q.put({"type": "stage", "msg": "Quality Assurance & Auto-fix", "pct": 85})
             summaries = fix_quality(summaries, page_map, api_key, q)
+            llm_delta = stats_since(llm_before)
+            for stage, msg in (("llm_cache", llm_cache.stats_msg(llm_delta)), ("llm_json", llm_json.stats_msg(llm_delta))):
+                if msg:
+                    q.put({"type": "stats", "stage": stage, "msg": msg})
+            for item in summaries:
+                publish_entry(job, item, "final")
+            if incremental or use_lastmod:
+                save_page_records(summaries, page_map, lastmods)
 
             # Generate
             q.put({"type": "stage", "msg": "Generating llms.txt", "pct": 97})
@@ -1045,9 +1558,11 @@ def start():
         except Exception as ex:
             q.put({"type": "error", "msg": str(ex)})
         finally:
-            jobs[job_id]["done"] = True
+            with job["changed"]:
+                job["done"] = True
+                job["changed"].notify_all()
 
-    threading.Thread(target=run_pipeline, daemon=True).start()
+    threading.Thread(target=contextvars.copy_context().run, args=(run_pipeline,), daemon=True).start()
     return jsonify({"job_id": job_id})
 
 @app.route("/progress/<job_id>")
@@ -1075,11 +1590,44 @@ def progress(job_id):
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.route("/entries/<job_id>")
+def stream_entries(job_id):
+    if job_id not in jobs:
+        return jsonify({"error": "Job not found"}), 404
+    start = request.headers.get("Last-Event-ID") or request.args.get("since", "0")
+
+    def event_stream():
+        job  = jobs[job_id]
+        sent = int(start) if start.isdigit() else 0
+        while True:
+            with job["changed"]:
+                if sent >= len(job["updates"]) and not job["done"]:
+                    job["changed"].wait(timeout=15)
+                updates, done = job["updates"][sent:], job["done"]
+            for entry in updates:
+                sent += 1
+                yield f"id: {sent}\ndata: {json.dumps(dict(entry, type='entry'))}\n\n"
+            if done and not updates:
+                yield f"data: {json.dumps({'type': 'end', 'total': len(job['entries'])})}\n\n"
+                break
+            if not updates:
+                yield f"data: {json.dumps({'type':'ping'})}\n\n"
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/download/<job_id>")
 def download(job_id):
-    if job_id not in jobs or jobs[job_id]["result"] is None:
+    job = jobs.get(job_id)
+    if job and job["result"] is None and request.args.get("partial") == "1" and job["entries"]:
+        buf = io.BytesIO(partial_llms_txt(job).encode("utf-8"))
+        return send_file(buf, mimetype="text/plain", as_attachment=True, download_name="llms.partial.txt")
+    if not job or job["result"] is None:
         return jsonify({"error": "Result not ready"}), 404
-    buf = io.BytesIO(jobs[job_id]["result"])
+    buf = io.BytesIO(job["result"])
     buf.seek(0)
     return send_file(buf, mimetype="text/plain", as_attachment=True, download_name="llms.txt")
 
@@ -2,197 +2,114 @@ import csv
 import re
 import json
 import time
-import requests
-import ollama
+import asyncio
+import os
+import hashlib
+import sqlite3
 import io
 import threading
+import contextvars
 import queue
 from flask import Flask, request, render_template_string, send_file, jsonify, Response, stream_with_context
 from collections import Counter, defaultdict
-from urllib.parse import urlparse, urlunparse
+from itertools import chain
+from contextlib import closing
+from urllib.parse import urlparse
+import llm_cache
+import llm_json
+import llm_backends
+import page_fetch
+from stats import bump, job_stats, stats_snapshot, stats_since
+from page_fetch import (fetch_pages, parse_sitemap, sitemap_locs, unique_urls, parse_lastmod,
+                        domain_rates, fetch_stats_msg)
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
 
-MODEL   = "mistral"
-HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; llms-txt-generator/1.0)"}
-jobs    = {}
+MODEL           = "mistral"
+STATE_DB        = os.environ.get("STATE_DB", "llms_state.db")
+LLM_BACKEND     = os.environ.get("LLM_BACKEND", "ollama")
+LLM_WORKERS     = int(os.environ.get("LLM_WORKERS", os.environ.get("OLLAMA_NUM_PARALLEL", 4)))
+LLM_NUM_CTX     = int(os.environ.get("LLM_NUM_CTX", 4096))
+LLM_KEEP_ALIVE  = os.environ.get("LLM_KEEP_ALIVE", "30m")
 
-# ─────────────────────────────────────────────────────
-# LLM
-# ─────────────────────────────────────────────────────
-def call_llm(prompt):
-    response = ollama.chat(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response["message"]["content"].strip()
+# Fetch fewer pages at once than the cloud app unless FETCH_WORKERS says otherwise.
+page_fetch.FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 8))
 
-# ─────────────────────────────────────────────────────
-# URL UTILITIES
-# ─────────────────────────────────────────────────────
-def clean_url(url):
-    try:
-        parsed = urlparse(url)
-        path   = re.sub(r'/{2,}', '/', parsed.path)
-        return urlunparse((parsed.scheme, parsed.netloc, path, '', '', ''))
-    except:
-        return url
+jobs            = {}
 
 # ─────────────────────────────────────────────────────
-# SITEMAP PARSING
+# LLM
 # ─────────────────────────────────────────────────────
-def parse_sitemap(source, is_file=False):
-    import xml.etree.ElementTree as ET
-
-    def extract_urls(xml_text):
-        urls = []
-        try:
-            root = ET.fromstring(xml_text)
-            ns   = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-            for child in root.findall("sm:sitemap", ns):
-                loc = child.find("sm:loc", ns)
-                if loc is not None and loc.text:
-                    try:
-                        r = requests.get(loc.text.strip(), headers=HEADERS, timeout=10)
-                        if r.status_code == 200:
-                            urls.extend(extract_urls(r.text))
-                    except:
-                        pass
-            for url_el in root.findall("sm:url", ns):
-                loc = url_el.find("sm:loc", ns)
-                if loc is not None and loc.text:
-                    urls.append(loc.text.strip())
-        except ET.ParseError:
-            pass
-        return urls
-
-    if is_file:
-        xml_text = source.decode("utf-8", errors="ignore") if isinstance(source, bytes) else source
-    else:
-        try:
-            r = requests.get(source, headers=HEADERS, timeout=15)
-            if r.status_code != 200:
-                return [], f"Could not fetch sitemap (HTTP {r.status_code})"
-            xml_text = r.text
-        except Exception as e:
-            return [], str(e)
-
-    return extract_urls(xml_text), None
+async def acall_llm(prompt, stage="llm", fresh=False, schema=None):
+    cached = None if fresh else await asyncio.to_thread(llm_cache.lookup, MODEL, prompt, None)
+    if llm_cache.LLM_CACHE_DB:
+        bump(llm_cache.stat_key(stage, cached is not None))
+    if cached is not None:
+        return cached
+
+    reply = await llm_backend().complete(prompt, max_tokens=600, schema=schema)
+    record_ollama_stats(reply)
+    await asyncio.to_thread(llm_cache.store, MODEL, prompt, None, reply["text"])
+    return reply["text"]
+
+# num_ctx stays fixed for every request: Ollama reloads the model whenever it
+# changes. 4096 fits the summarize prompt (~5.7k chars with 3500 chars of page
+# content) plus the reply; Ollama's 2048 default silently cuts the prompt head.
+OLLAMA_OPTIONS = {"num_ctx": LLM_NUM_CTX}
+KEEP_ALIVE     = int(LLM_KEEP_ALIVE) if re.fullmatch(r"-?\d+", LLM_KEEP_ALIVE) else LLM_KEEP_ALIVE
+
+_llm_backend      = None
+_llm_backend_lock = threading.Lock()
+
+def llm_backend():
+    global _llm_backend
+    with _llm_backend_lock:
+        if _llm_backend is None:
+            if LLM_BACKEND == "fake":
+                _llm_backend = llm_backends.FakeBackend()
+            else:
+                _llm_backend = llm_backends.OllamaBackend(MODEL, OLLAMA_OPTIONS, KEEP_ALIVE)
+        return _llm_backend
+
+def record_ollama_stats(reply):
+    bump("llm_requests")
+    bump("llm_tokens", reply["prompt_tokens"] + reply["completion_tokens"])
+    bump("llm_eval_tokens", reply["completion_tokens"])
+    bump("llm_eval_ms", reply["eval_ms"])
+    bump("llm_load_ms", reply["load_ms"])
+
+async def warm_model(progress_q=None):
+    try:
+        reply = await llm_backend().warm()
+        bump("llm_load_ms", reply["load_ms"] if reply else 0)
+    except Exception as e:
+        bump("llm_warm_failures")
+        if progress_q is not None:
+            progress_q.put({"type": "stats", "stage": "warm",
+                            "msg": f"Could not warm up {MODEL} ({e}); it loads with the first request instead"})
+
+def parse_reply(raw):
+    try:
+        value, repaired = llm_json.parse(raw)
+    except ValueError:
+        bump("llm_parse_failed")
+        raise
+    bump("llm_parse_repaired" if repaired else "llm_parse_ok")
+    return value
 
 # ─────────────────────────────────────────────────────
-# PAGE FETCHING
+# JOB STATS
 # ─────────────────────────────────────────────────────
-def extract_meta(html):
-    def clean(s):
-        s = re.sub(r"<[^>]+>", " ", s)
-        s = re.sub(r"&amp;", "&", s)
-        s = re.sub(r"&quot;", '"', s)
-        s = re.sub(r"&#39;", "'", s)
-        s = re.sub(r"&[a-z]+;", " ", s)
-        return re.sub(r"\s+", " ", s).strip()
-
-    m = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
-    meta_title = clean(m.group(1)) if m else ""
-    meta_title = re.split(r"\s*[|\u2013\u2014]\s*", meta_title)[0].strip()
-
-    m = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-    if not m:
-        m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+name=["\']description["\']', html, re.IGNORECASE | re.DOTALL)
-    meta_desc = clean(m.group(1)) if m else ""
-
-    if not meta_desc:
-        m = re.search(r'<meta[^>]+property=["\']og:description["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-        if not m:
-            m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+property=["\']og:description["\']', html, re.IGNORECASE | re.DOTALL)
-        meta_desc = clean(m.group(1)) if m else ""
-
-    if not meta_title:
-        m = re.search(r'<meta[^>]+property=["\']og:title["\'][^>]+content=["\'](.*?)["\']', html, re.IGNORECASE | re.DOTALL)
-        meta_title = clean(m.group(1)) if m else ""
-
-    m = re.search(r"<h1[^>]*>(.*?)</h1>", html, re.IGNORECASE | re.DOTALL)
-    h1 = clean(m.group(1)) if m else ""
-
-    h2s = re.findall(r"<h2[^>]*>(.*?)</h2>", html, re.IGNORECASE | re.DOTALL)
-    h2s = [clean(h) for h in h2s if len(clean(h)) > 3][:6]
-
-    return {
-        "meta_title": meta_title[:200],
-        "meta_desc" : meta_desc[:400],
-        "h1"        : h1[:150],
-        "h2s"       : " | ".join(h2s)[:300] if h2s else "",
-    }
-
-def extract_main_content(html):
-    for tag in ["main", "article"]:
-        pat = re.compile(r"<" + tag + r"[^>]*>(.*?)</" + tag + r">", re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    pat = re.compile(r'<[^>]+role="main"[^>]*>(.*?)</(?:div|section|main)>', re.DOTALL | re.IGNORECASE)
-    m = pat.search(html)
-    if m and len(m.group(1)) > 200:
-        return m.group(1)
-
-    for id_val in ["content", "main", "main-content", "page-content", "article", "primary"]:
-        pat = re.compile(r'<(?:div|section)[^>]+id="' + id_val + r'"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    for cls_val in ["content", "main", "article", "entry-content", "post-content"]:
-        pat = re.compile(r'<(?:div|section)[^>]+class="[^"]*' + cls_val + r'[^"]*"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
-        m = pat.search(html)
-        if m and len(m.group(1)) > 200:
-            return m.group(1)
-
-    return html
-
-def fetch_page(url):
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        if r.status_code != 200:
-            return None
-        raw_html = r.text
-        meta     = extract_meta(raw_html)
-
-        html = raw_html
-        for tag in ["script", "style", "nav", "footer", "header", "aside", "noscript", "iframe", "svg", "form"]:
-            html = re.sub(r"<" + tag + r"[^>]*>.*?</" + tag + r">", " ", html, flags=re.DOTALL | re.IGNORECASE)
-
-        for noise in ["sidebar", "widget", "banner", "promo", "advertisement",
-                      "breadcrumb", "pagination", "related", "social", "share",
-                      "cookie", "popup", "modal", "overlay", "newsletter"]:
-            pat = re.compile(
-                r'<(?:div|section|ul|span)[^>]+(?:class|id)="[^"]*' + noise + r'[^"]*"[^>]*>.*?</(?:div|section|ul|span)>',
-                re.DOTALL | re.IGNORECASE
-            )
-            html = pat.sub(" ", html)
-
-        main_html = extract_main_content(html)
-        body = re.sub(r"<[^>]+>", " ", main_html)
-        body = re.sub(r"\+\d[\d\s\-(). ]{7,20}", " ", body)
-        body = re.sub(r"[A-Fa-f0-9]{40,}", " ", body)
-        body = re.sub(r"\s+", " ", body).strip()
-
-        parts = []
-        if meta["meta_title"]:
-            parts.append(f"META TITLE: {meta['meta_title']}")
-        if meta["meta_desc"]:
-            parts.append(f"META DESCRIPTION: {meta['meta_desc']}")
-        if meta["h1"] and meta["h1"].lower() != meta["meta_title"].lower():
-            parts.append(f"H1: {meta['h1']}")
-        if meta["h2s"]:
-            parts.append(f"H2s: {meta['h2s']}")
-        if body:
-            parts.append(f"CONTENT: {body[:2000]}")
-
-        structured = "\n".join(parts)
-        return structured if len(structured) > 100 else None
-    except:
-        return None
+def llm_stats_msg(delta, elapsed):
+    requests_made = delta.get("llm_requests", 0)
+    msg = (f"LLM: {requests_made} requests · {delta.get('llm_tokens', 0) / 1000:.1f}k tokens"
+           f" · {delta.get('llm_eval_tokens', 0) / max(elapsed, 0.001):.1f} tokens/s generated across {LLM_WORKERS} workers")
+    if delta.get("llm_eval_ms"):
+        msg += f" · {delta['llm_eval_tokens'] * 1000 / delta['llm_eval_ms']:.1f} tokens/s per request"
+    if delta.get("llm_load_ms"):
+        msg += f" · {delta['llm_load_ms'] / 1000:.1f}s loading the model"
+    return msg
 
 # ─────────────────────────────────────────────────────
 # SUMMARIZATION
@@ -272,33 +189,49 @@ Page B current description: {desc_b}
 
 Return ONLY JSON: {{"description": "<rewritten description for Page B>"}}"""
 
-def summarize(url, content):
+async def summarize(url, content):
     snippet = content[:3500].strip()
     if not snippet:
         return None
     for attempt in range(3):
         try:
-            raw = call_llm(SUMMARIZE_PROMPT.format(url=url, content=snippet))
-            if raw.startswith("```"):
-                raw = raw.split("```")[1]
-                if raw.startswith("json"):
-                    raw = raw[4:]
-            result = json.loads(raw.strip())
-            if "title" in result and "description" in result:
+            raw    = await acall_llm(SUMMARIZE_PROMPT.format(url=url, content=snippet), stage="summarize", fresh=attempt > 0,
+                                    schema=llm_json.SUMMARY_SCHEMA)
+            result = parse_reply(raw)
+            if isinstance(result, dict) and "title" in result and "description" in result:
                 return result
         except:
             if attempt < 2:
-                time.sleep(0.5)
+                await asyncio.sleep(0.5)
     return None
 
-def rescore_and_fix(url, content, description):
+def summarize_pages(pages, progress_q=None, report=True, on_result=None):
+    return llm_backends.run(summarize_all(pages, progress_q, report, on_result))
+
+async def summarize_all(pages, progress_q=None, report=True, on_result=None):
+    results = {}
+    done    = 0
+
+    async def worker(page):
+        nonlocal done
+        result = await summarize(page["url"], page["content"])
+        if result and on_result:
+            on_result(page["url"], result)
+        results[page["url"]] = result
+        done += 1
+        if progress_q and report:
+            progress_q.put({"type": "summarize", "current": done, "total": len(pages), "url": page["url"], "ok": result is not None})
+
+    await llm_backends.gather_limited([worker(page) for page in pages], LLM_WORKERS)
+    return results
+
+async def rescore_and_fix(url, content, description):
     try:
-        raw = call_llm(RESCORE_PROMPT.format(url=url, content=content[:1500], description=description))
-        if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
-                raw = raw[4:]
-        result = json.loads(raw.strip())
+        raw    = await acall_llm(RESCORE_PROMPT.format(url=url, content=content[:1500], description=description),
+                                 stage="rescore", schema=llm_json.RESCORE_SCHEMA)
+        result = parse_reply(raw)
+        if not isinstance(result, dict):
+            return 3, description
         desc   = result.get("description", description).strip()
         return int(result.get("score", 3)), desc if desc else description
     except:
@@ -354,9 +287,39 @@ def description_similarity(a, b):
         return 0.0
     return len(words_a & words_b) / min(len(words_a), len(words_b))
 
-def fix_quality(summaries, page_map, progress_q=None):
-    total = len(summaries)
+async def rescore_all(items, page_map, progress_q=None):
+    done, fixed = 0, 0
 
+    async def rescore(item):
+        nonlocal done, fixed
+        _, new_desc = await rescore_and_fix(item["url"], page_map[item["url"]], item["description"])
+        if new_desc != item["description"]:
+            item["description"] = new_desc
+            fixed += 1
+        done += 1
+        if progress_q and (done % 5 == 0 or done == len(items)):
+            progress_q.put({"type": "qa_rescore", "current": done, "total": len(items)})
+
+    await llm_backends.gather_limited([rescore(item) for item in items], LLM_WORKERS)
+    return fixed
+
+async def differentiate(item_a, item_b, content_b):
+    try:
+        raw = await acall_llm(DIFFERENTIATE_PROMPT.format(
+            url_a=item_a["url"], desc_a=item_a["description"],
+            url_b=item_b["url"], content_b=content_b[:2000],
+            desc_b=item_b["description"]
+        ), stage="differentiate", schema=llm_json.DIFFERENTIATE_SCHEMA)
+        result   = parse_reply(raw)
+        new_desc = result.get("description", "").strip() if isinstance(result, dict) else ""
+        if new_desc and len(new_desc) > 60:
+            item_b["description"] = new_desc
+            return True
+    except:
+        pass
+    return False
+
+def fix_quality(summaries, page_map, progress_q=None):
     # Phase 1 — structural fixes (no LLM)
     if progress_q:
         progress_q.put({"type": "stage", "msg": "QA Phase 1 — Structural fixes", "pct": 86})
@@ -385,18 +348,8 @@ def fix_quality(summaries, page_map, progress_q=None):
     if progress_q:
         progress_q.put({"type": "stage", "msg": "QA Phase 2 — LLM scoring & rewrite", "pct": 90})
 
-    rescore_fixed = 0
-    for i, item in enumerate(summaries):
-        score, _ = score_description(item["description"])
-        if score <= 3:
-            content = page_map.get(item["url"], "")
-            if content:
-                _, new_desc = rescore_and_fix(item["url"], content, item["description"])
-                if new_desc != item["description"]:
-                    item["description"] = new_desc
-                    rescore_fixed += 1
-            if progress_q and i % 5 == 0:
-                progress_q.put({"type": "qa_rescore", "current": i + 1, "total": total})
+    weak          = [item for item in summaries if score_description(item["description"])[0] <= 3 and page_map.get(item["url"])]
+    rescore_fixed = llm_backends.run(rescore_all(weak, page_map, progress_q))
 
     if progress_q:
         progress_q.put({"type": "qa_result", "fixed": rescore_fixed, "dups": 0})
@@ -409,36 +362,76 @@ def fix_quality(summaries, page_map, progress_q=None):
     for item in summaries:
         domain_groups[urlparse(item["url"]).netloc].append(item)
 
+    # Rewrites for one item_a only touch the later siblings, so each row of the
+    # comparison runs concurrently without changing the result.
     dedup_fixed = 0
     for items in domain_groups.values():
         for i in range(len(items)):
-            for j in range(i + 1, len(items)):
-                if description_similarity(items[i]["description"], items[j]["description"]) >= 0.70:
-                    content_b = page_map.get(items[j]["url"], "")
-                    if not content_b:
-                        continue
-                    try:
-                        raw = call_llm(DIFFERENTIATE_PROMPT.format(
-                            url_a=items[i]["url"], desc_a=items[i]["description"],
-                            url_b=items[j]["url"], content_b=content_b[:2000],
-                            desc_b=items[j]["description"]
-                        ))
-                        if raw.startswith("```"):
-                            raw = raw.split("```")[1]
-                            if raw.startswith("json"):
-                                raw = raw[4:]
-                        new_desc = json.loads(raw.strip()).get("description", "").strip()
-                        if new_desc and len(new_desc) > 60:
-                            items[j]["description"] = new_desc
-                            dedup_fixed += 1
-                    except:
-                        pass
+            similar = [item for item in items[i + 1:] if page_map.get(item["url"])
+                       and description_similarity(items[i]["description"], item["description"]) >= 0.70]
+            if similar:
+                fixed = llm_backends.run(llm_backends.gather_limited(
+                    [differentiate(items[i], item, page_map[item["url"]]) for item in similar], LLM_WORKERS))
+                dedup_fixed += sum(fixed)
 
     if progress_q:
         progress_q.put({"type": "qa_result", "fixed": dedup_fixed, "dups": 0})
 
     return summaries
 
+# ─────────────────────────────────────────────────────
+# INCREMENTAL STATE
+# ─────────────────────────────────────────────────────
+def state_connect():
+    conn = sqlite3.connect(STATE_DB, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+        url          TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        title        TEXT NOT NULL,
+        description  TEXT NOT NULL,
+        updated      REAL NOT NULL,
+        lastmod      TEXT
+    )""")
+    if "lastmod" not in {row[1] for row in conn.execute("PRAGMA table_info(pages)")}:
+        conn.execute("ALTER TABLE pages ADD COLUMN lastmod TEXT")
+    return conn
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def load_page_records(urls):
+    urls, records = list(urls), {}
+    with closing(state_connect()) as conn:
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            rows  = conn.execute(
+                f"SELECT url, content_hash, title, description FROM pages WHERE url IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for url, digest, title, description in rows:
+                records[url] = {"content_hash": digest, "title": title, "description": description}
+    return records
+
+def save_page_records(summaries, page_map, lastmods):
+    now  = time.time()
+    rows = [(item["url"], content_hash(page_map[item["url"]]), item["title"], item["description"], now, lastmods.get(item["url"]))
+            for item in summaries if item["url"] in page_map]
+    with closing(state_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO pages (url, content_hash, title, description, updated, lastmod) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+def skip_unchanged(urls, lastmods, skipped, order):
+    with closing(state_connect()) as conn:
+        for url in urls:
+            order[url] = len(order)
+            row        = conn.execute("SELECT title, description, lastmod FROM pages WHERE url = ?", (url,)).fetchone()
+            stored     = parse_lastmod(row[2]) if row else None
+            current    = parse_lastmod(lastmods.get(url))
+            if stored and current and current <= stored:
+                skipped[url] = {"url": url, "title": row[0], "description": row[1]}
+                continue
+            yield url
+
 # ─────────────────────────────────────────────────────
 # OUTPUT
 # ─────────────────────────────────────────────────────
@@ -453,6 +446,24 @@ def generate_llms_txt(summaries):
             lines.append("")
     return "\n".join(lines)
 
+# Entries are published as soon as a page is summarised ("provisional") and
+# again once QA has finished with them ("final"), so a running job can be
+# previewed and downloaded. updates is an append-only log the /entries stream
+# replays from any offset.
+def publish_entry(job, item, status):
+    entry = {"url": item["url"], "title": item.get("title", ""), "description": item.get("description", ""), "status": status}
+    with job["changed"]:
+        job["entries"][entry["url"]] = entry
+        job["updates"].append(entry)
+        job["changed"].notify_all()
+
+def partial_llms_txt(job):
+    with job["changed"]:
+        entries = list(job["entries"].values())
+    order = job["order"]
+    entries.sort(key=lambda entry: order.get(entry["url"], len(order)))
+    return generate_llms_txt(entries)
+
 # ─────────────────────────────────────────────────────
 # HTML UI
 # ─────────────────────────────────────────────────────
@@ -512,6 +523,10 @@ HTML = """<!DOCTYPE html>
     }
     .sitemap-input:focus { border-color: #6c47ff; }
     .sitemap-hint { font-size: 11px; color: #aaa; margin-top: -16px; margin-bottom: 20px; }
+    .option-row {
+      display: flex; align-items: center; gap: 8px; margin-bottom: 12px;
+      font-size: 12px; font-weight: 500; color: #555; cursor: pointer;
+    }
     #submitBtn {
       width: 100%; padding: 14px; background: #6c47ff; color: #fff;
       border: none; border-radius: 10px; font-size: 15px; font-weight: 700;
@@ -558,6 +573,20 @@ HTML = """<!DOCTYPE html>
     .log-line.stage   { color: #60cdff; font-weight: bold; }
     .log-line.error   { color: #f87171; }
     .log-line.qa      { color: #c084fc; }
+    .partial-box { display: none; margin-top: 16px; border: 1px solid #e5e7eb; border-radius: 10px; overflow: hidden; }
+    .partial-box.show { display: block; }
+    .partial-header {
+      display: flex; justify-content: space-between; align-items: center;
+      background: #f9fafb; padding: 8px 14px; font-size: 11px; font-weight: 700; color: #555;
+    }
+    .partial-btn {
+      background: #fff; color: #6c47ff; border: 1.5px solid #6c47ff; border-radius: 8px;
+      padding: 4px 10px; font-size: 11px; font-weight: 700; cursor: pointer;
+    }
+    .partial-preview {
+      max-height: 220px; overflow-y: auto; padding: 10px 14px; margin: 0;
+      font-family: monospace; font-size: 11px; line-height: 1.6; color: #333; white-space: pre-wrap;
+    }
     .result-box {
       display: none; margin-top: 20px; padding: 18px 20px;
       background: #f0fdf4; border: 1.5px solid #6ee7b7;
@@ -611,14 +640,17 @@ HTML = """<!DOCTYPE html>
 
     <div class="tab-panel" id="panel-sitemapfile" style="display:none">
       <div class="upload-area" id="uploadAreaXml">
-        <input type="file" id="sitemap_file" accept=".xml">
+        <input type="file" id="sitemap_file" accept=".xml,.gz">
         <div class="upload-icon">🗺</div>
         <div class="upload-text">Click to upload sitemap.xml</div>
-        <div class="upload-hint">Sitemap index supported</div>
+        <div class="upload-hint">Sitemap index and .xml.gz supported</div>
         <div class="file-name" id="fileNameXml"></div>
       </div>
     </div>
 
+    <label class="option-row"><input type="checkbox" id="incremental"> Reuse summaries for pages unchanged since the last run</label>
+    <label class="option-row"><input type="checkbox" id="use_lastmod"> Skip sitemap pages whose lastmod hasn't changed since the last run</label>
+
     <button type="submit" id="submitBtn">Generate llms.txt</button>
   </form>
 
@@ -644,6 +676,13 @@ HTML = """<!DOCTYPE html>
       <div class="log-header">LIVE LOG</div>
       <div class="log-area" id="logArea"></div>
     </div>
+    <div class="partial-box" id="partialBox">
+      <div class="partial-header">
+        <span id="partialCount"></span>
+        <button type="button" class="partial-btn" id="partialBtn">⬇ Download partial llms.txt</button>
+      </div>
+      <pre class="partial-preview" id="partialPreview"></pre>
+    </div>
     <div class="result-box" id="resultBox">
       <div class="result-info">🎉 llms.txt is ready!<span id="resultSub"></span></div>
       <button class="download-btn" id="downloadBtn">⬇ Download llms.txt</button>
@@ -655,7 +694,9 @@ HTML = """<!DOCTYPE html>
 <script>
   let resultBlob = null
   let activeTab  = 'csv'
+  let partialUrl = null
   const STAGES   = ['fetch', 'summarize', 'qa', 'generate']
+  const PREVIEW_MAX = 50
 
   function switchTab(btn, tab) {
     activeTab = tab
@@ -741,6 +782,7 @@ HTML = """<!DOCTYPE html>
     document.getElementById('logArea').innerHTML = ''
     document.getElementById('resultBox').classList.remove('show')
     document.getElementById('errorBox').classList.remove('show')
+    document.getElementById('partialBox').classList.remove('show')
     document.getElementById('progressFill').style.width = '0%'
     document.getElementById('spinner').style.display    = ''
     resultBlob = null
@@ -755,6 +797,8 @@ HTML = """<!DOCTYPE html>
 
     const formData = new FormData()
     formData.set('input_mode', activeTab)
+    if (document.getElementById('incremental').checked) formData.set('incremental', '1')
+    if (document.getElementById('use_lastmod').checked) formData.set('use_lastmod', '1')
     if (activeTab === 'csv')         formData.set('csv_file', document.getElementById('csv_file').files[0])
     if (activeTab === 'sitemap')     formData.set('sitemap_url', document.getElementById('sitemap_url').value.trim())
     if (activeTab === 'sitemapfile') formData.set('sitemap_file', document.getElementById('sitemap_file').files[0])
@@ -769,6 +813,27 @@ HTML = """<!DOCTYPE html>
       btn.disabled = false; btn.textContent = 'Generate llms.txt'; return
     }
 
+    partialUrl = '/download/' + jobId + '?partial=1'
+    const entries = new Map()
+    let renderTimer = null
+    function renderPartial() {
+      renderTimer = null
+      const all   = [...entries.values()]
+      const final = all.filter(e => e.status === 'final').length
+      document.getElementById('partialCount').textContent =
+        `PARTIAL LLMS.TXT · ${all.length} entries (${final} final · ${all.length - final} provisional)`
+      document.getElementById('partialPreview').textContent = all.slice(-PREVIEW_MAX)
+        .map(e => `- Source: ${e.url}\\n  Title: ${e.title}\\n  Description: ${e.description}\\n`).join('\\n')
+      document.getElementById('partialBox').classList.add('show')
+    }
+    const entrySource = new EventSource('/entries/' + jobId)
+    entrySource.onmessage = function(e) {
+      const d = JSON.parse(e.data)
+      if (d.type === 'end') { entrySource.close(); if (entries.size) renderPartial(); return }
+      if (d.type !== 'entry') return
+      entries.set(d.url, d)
+      if (!renderTimer) renderTimer = setTimeout(renderPartial, 500)
+    }
     const evtSource = new EventSource('/progress/' + jobId)
     evtSource.onmessage = function(e) {
       const d = JSON.parse(e.data)
@@ -784,12 +849,15 @@ HTML = """<!DOCTYPE html>
 
       } else if (d.type === 'fetch') {
         setProgress('Fetching pages', Math.round((d.current/d.total)*28)+4, `${d.current} / ${d.total}`, d.url)
-        addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}`, d.ok?'success':'warning')
+        addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}${d.rps ? ` · ${d.rps} req/s` : ''}`, d.ok?'success':'warning')
 
       } else if (d.type === 'summarize') {
         setProgress('Summarising with Mistral', Math.round((d.current/d.total)*46)+33, `${d.current} / ${d.total}`, d.url)
         addLog(`${d.ok?'✓':'✗'} [${d.current}/${d.total}] ${d.url}`, d.ok?'success':'warning')
 
+      } else if (d.type === 'stats') {
+        addLog('  ↳ ' + d.msg, 'info')
+
       } else if (d.type === 'qa_result') {
         if (d.fixed > 0 || d.dups > 0) addLog(`  ↳ Fixed ${d.fixed} descriptions · ${d.dups} duplicate titles resolved`, 'qa')
 
@@ -821,6 +889,11 @@ HTML = """<!DOCTYPE html>
     evtSource.onerror = () => evtSource.close()
   })
 
+  document.getElementById('partialBtn')?.addEventListener('click', function() {
+    if (!partialUrl) return
+    const a = document.createElement('a')
+    a.href = partialUrl; a.click()
+  })
   document.getElementById('downloadBtn')?.addEventListener('click', function() {
     if (!resultBlob) return
     const url = URL.createObjectURL(resultBlob)
@@ -841,7 +914,18 @@ def index():
 
 @app.route("/start", methods=["POST"])
 def start():
+    token = job_stats.set(Counter())
+    try:
+        return start_job()
+    finally:
+        job_stats.reset(token)
+
+def start_job():
+    stats_before = stats_snapshot()
     input_mode = request.form.get("input_mode", "csv")
+    incremental  = request.form.get("incremental") == "1"
+    use_lastmod  = request.form.get("use_lastmod") == "1"
+    lastmods     = {}
     urls_raw   = []
 
     if input_mode == "csv":
@@ -854,71 +938,119 @@ def start():
         sitemap_url = request.form.get("sitemap_url", "").strip()
         if not sitemap_url:
             return jsonify({"error": "No sitemap URL provided"}), 400
-        urls_raw, err = parse_sitemap(sitemap_url, is_file=False)
+        entries, err = parse_sitemap(sitemap_url, is_file=False)
         if err:
             return jsonify({"error": f"Sitemap error: {err}"}), 400
+        urls_raw = sitemap_locs(entries, lastmods)
 
     elif input_mode == "sitemapfile":
         if "sitemap_file" not in request.files:
             return jsonify({"error": "No sitemap file uploaded"}), 400
-        urls_raw, err = parse_sitemap(request.files["sitemap_file"].stream.read(), is_file=True)
+        entries, err = parse_sitemap(request.files["sitemap_file"].stream.read(), is_file=True)
         if err:
             return jsonify({"error": f"Sitemap parse error: {err}"}), 400
+        urls_raw = sitemap_locs(entries, lastmods)
 
-    seen = set()
-    urls = [u for u in (clean_url(u) for u in urls_raw) if not (u in seen or seen.add(u))]
-    if not urls:
-        return jsonify({"error": "No valid URLs found"}), 400
+    if isinstance(urls_raw, list):
+        urls = list(unique_urls(urls_raw))
+        if not urls:
+            return jsonify({"error": "No valid URLs found"}), 400
+    else:
+        urls  = unique_urls(urls_raw)
+        first = next(urls, None)
+        if first is None:
+            return jsonify({"error": "No valid URLs found"}), 400
+        urls = chain([first], urls)
 
     job_id       = str(int(time.time() * 1000))
     q            = queue.Queue()
-    jobs[job_id] = {"queue": q, "result": None, "done": False}
+    job          = {"queue": q, "result": None, "done": False, "entries": {}, "updates": [], "order": {},
+                    "changed": threading.Condition()}
+    jobs[job_id] = job
+
+    def publish(url, result):
+        publish_entry(job, {"url": url, **result}, "provisional")
 
     def run_pipeline():
+        llm_backends.submit(warm_model(q))
         try:
-            total = len(urls)
-            q.put({"type": "stage", "msg": f"{total} URLs loaded", "pct": 2})
+            if isinstance(urls, list):
+                q.put({"type": "stage", "msg": f"{len(urls)} URLs loaded", "pct": 2})
+            else:
+                q.put({"type": "stage", "msg": "Expanding sitemap — pages are fetched as URLs arrive", "pct": 2})
 
             # Fetch
+            skipped, order, source = {}, {}, urls
+            if use_lastmod and not isinstance(urls, list):
+                source = skip_unchanged(urls, lastmods, skipped, order)
+
             q.put({"type": "stage", "msg": "Fetching pages", "pct": 5})
-            pages = []
-            for i, url in enumerate(urls, 1):
-                content = fetch_page(url)
-                ok      = content is not None
-                if ok:
-                    pages.append({"url": url, "content": content})
-                q.put({"type": "fetch", "current": i, "total": total, "url": url, "ok": ok})
-                time.sleep(0.2)
-
-            if not pages:
+            pages = fetch_pages(source, q)
+            delta = stats_since(stats_before)
+            rates = domain_rates(p["url"] for p in pages)
+            q.put({"type": "stats", "stage": "fetch", "stats": delta, "rps": rates, "msg": fetch_stats_msg(delta, rates)})
+
+            if skipped:
+                q.put({"type": "stage", "msg": f"Skipped {len(skipped)} pages whose sitemap lastmod is unchanged", "pct": 32})
+            if not pages and not skipped:
                 q.put({"type": "error", "msg": "Could not fetch any pages"}); return
 
-            page_map = {p["url"]: p["content"] for p in pages}
+            page_map     = {p["url"]: p["content"] for p in pages}
+            records      = load_page_records(page_map) if incremental else {}
+            job["order"] = order or {url: i for i, url in enumerate(page_map)}
 
             # Summarize
+            summaries, failed, pending = list(skipped.values()), [], []
+            for page in pages:
+                record = records.get(page["url"])
+                if record and record["content_hash"] == content_hash(page["content"]):
+                    summaries.append({"url": page["url"], "title": record["title"], "description": record["description"]})
+                else:
+                    pending.append(page)
+            for item in summaries:
+                publish_entry(job, item, "provisional")
+            reused = len(summaries) - len(skipped)
+            if reused:
+                q.put({"type": "stage", "msg": f"Reusing {reused} unchanged summaries", "pct": 33})
+
             q.put({"type": "stage", "msg": "Summarising with Mistral", "pct": 33})
-            summaries, failed = [], []
-            for i, page in enumerate(pages, 1):
-                result = summarize(page["url"], page["content"])
+            llm_before, started = stats_snapshot(), time.time()
+            results = summarize_pages(pending, q, on_result=publish)
+            for page in pending:
+                result = results.get(page["url"])
                 if result:
                     summaries.append({"url": page["url"], "title": result.get("title", ""), "description": result.get("description", "")})
                 else:
                     failed.append(page)
-                q.put({"type": "summarize", "current": i, "total": len(pages), "url": page["url"], "ok": result is not None})
 
             if failed:
                 q.put({"type": "stage", "msg": f"Retrying {len(failed)} failed pages", "pct": 80})
+                results = summarize_pages(failed, q, report=False, on_result=publish)
                 for page in failed:
-                    result = summarize(page["url"], page["content"])
+                    result = results.get(page["url"])
                     if result:
                         summaries.append({"url": page["url"], "title": result.get("title", ""), "description": result.get("description", "")})
+            if pending:
+                delta = stats_since(llm_before)
+                q.put({"type": "stats", "stage": "summarize", "stats": delta, "msg": llm_stats_msg(delta, time.time() - started)})
 
             if not summaries:
                 q.put({"type": "error", "msg": "Could not summarize any pages"}); return
 
+            order = job["order"]
+            summaries.sort(key=lambda item: order[item["url"]])
+
             # QA
             q.put({"type": "stage", "msg": "Quality Assurance & Auto-fix", "pct": 85})
             summaries = fix_quality(summaries, page_map, q)
+            llm_delta = stats_since(llm_before)
+            for stage, msg in (("llm_cache", llm_cache.stats_msg(llm_delta)), ("llm_json", llm_json.stats_msg(llm_delta))):
+                if msg:
+                    q.put({"type": "stats", "stage": stage, "msg": msg})
+            for item in summaries:
+                publish_entry(job, item, "final")
+            if incremental or use_lastmod:
+                save_page_records(summaries, page_map, lastmods)
 
             # Generate
             q.put({"type": "stage", "msg": "Generating llms.txt", "pct": 97})
@@ -928,9 +1060,11 @@ def start():
         except Exception as ex:
             q.put({"type": "error", "msg": str(ex)})
         finally:
-            jobs[job_id]["done"] = True
+            with job["changed"]:
+                job["done"] = True
+                job["changed"].notify_all()
 
-    threading.Thread(target=run_pipeline, daemon=True).start()
+    threading.Thread(target=contextvars.copy_context().run, args=(run_pipeline,), daemon=True).start()
     return jsonify({"job_id": job_id})
 
 @app.route("/progress/<job_id>")
@@ -958,15 +1092,50 @@ def progress(job_id):
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.route("/entries/<job_id>")
+def stream_entries(job_id):
+    if job_id not in jobs:
+        return jsonify({"error": "Job not found"}), 404
+    start = request.headers.get("Last-Event-ID") or request.args.get("since", "0")
+
+    def event_stream():
+        job  = jobs[job_id]
+        sent = int(start) if start.isdigit() else 0
+        while True:
+            with job["changed"]:
+                if sent >= len(job["updates"]) and not job["done"]:
+                    job["changed"].wait(timeout=15)
+                updates, done = job["updates"][sent:], job["done"]
+            for entry in updates:
+                sent += 1
+                yield f"id: {sent}\ndata: {json.dumps(dict(entry, type='entry'))}\n\n"
+            if done and not updates:
+                yield f"data: {json.dumps({'type': 'end', 'total': len(job['entries'])})}\n\n"
+                break
+            if not updates:
+                yield f"data: {json.dumps({'type':'ping'})}\n\n"
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/download/<job_id>")
 def download(job_id):
-    if job_id not in jobs or jobs[job_id]["result"] is None:
+    job = jobs.get(job_id)
+    if job and job["result"] is None and request.args.get("partial") == "1" and job["entries"]:
+        buf = io.BytesIO(partial_llms_txt(job).encode("utf-8"))
+        return send_file(buf, mimetype="text/plain", as_attachment=True, download_name="llms.partial.txt")
+    if not job or job["result"] is None:
         return jsonify({"error": "Result not ready"}), 404
-    buf = io.BytesIO(jobs[job_id]["result"])
+    buf = io.BytesIO(job["result"])
     buf.seek(0)
     return send_file(buf, mimetype="text/plain", as_attachment=True, download_name="llms.txt")
 
 if __name__ == "__main__":
     print("\n✅ llms.txt Generator running!")
+    print(f"   {MODEL}: {LLM_WORKERS} concurrent requests · num_ctx {LLM_NUM_CTX} · keep_alive {LLM_KEEP_ALIVE}")
     print("👉 Open: http://localhost:5000\n")
+    llm_backends.submit(warm_model())
     app.run(host="127.0.0.1", port=5000, debug=False, threaded=True)
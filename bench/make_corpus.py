@@ -0,0 +1,110 @@
+import os
+import random
+import argparse
+
+# Writes the synthetic pages in bench/corpus/. They are generated rather than saved
+# from real sites: each one imitates the structure of a kind of page (docs layout,
+# pricing table, SPA shell, legacy tables, cp1252 encoding) or stresses the
+# extractor (unclosed wrappers, bare "<" in text). The seed is fixed, so the output
+# is byte-for-byte stable and the golden files stay valid.
+
+ROOT       = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(ROOT, "corpus")
+WORDS      = ("configure deploy cluster policy agent endpoint dashboard backup restore audit license tenant "
+              "schedule report sync").split()
+
+
+# ─────────────────────────────────────────────────────
+# BUILDING BLOCKS
+# ─────────────────────────────────────────────────────
+def para(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def nav():
+    return "<nav class='top'><ul>" + "".join(f"<li><a href='/x{i}'>Link {i}</a></li>" for i in range(40)) + "</ul></nav>"
+
+def footer():
+    return ("<footer><p>Call +1 (555) 123-4567 · © 2026</p><ul>"
+            + "".join(f"<li><a href='#'>F{i}</a></li>" for i in range(30)) + "</ul></footer>")
+
+def head(title, description):
+    return (f"<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'><title>{title} | Acme Docs</title>"
+            f"<meta name=\"description\" content=\"{description}\"><meta property='og:title' content='{title}'>"
+            f"<link rel='stylesheet' href='/a.css'><script>window.dataLayer=[];{'var x=1;' * 200}</script>"
+            f"<style>{'.a{color:red}' * 200}</style></head>")
+
+
+# ─────────────────────────────────────────────────────
+# PAGES
+# ─────────────────────────────────────────────────────
+def build_pages(seed=7):
+    rng, pages = random.Random(seed), {}
+    pages["docs"] = (
+        head("Configuring Backup Policies", "Learn how IT admins configure backup policies &amp; retention.") + "<body>" + nav()
+        + "<div class='layout'><aside class='sidebar'>" + "".join(f"<a>Side {i}</a>" for i in range(50))
+        + "</aside><main id='content'><h1>Configuring backup policies</h1>"
+        + "".join(f"<h2>Step {i}: {para(rng, 3)}</h2><p>{para(rng, 60)}</p><pre>{'ab' * 30}</pre>" for i in range(8))
+        + "<div class='share-buttons'>Share on X</div></main></div>" + footer() + "</body></html>"
+    )
+    pages["pricing"] = (
+        head("Pricing &mdash; Plans", "Compare Standard, Pro and Enterprise plans.") + "<body>" + nav()
+        + "<div id='main-content'><h1>Plans &amp; pricing</h1><table>"
+        + "".join(f"<tr><td>{para(rng, 4)}</td><td>${i * 10}/mo</td></tr>" for i in range(30))
+        + "</table><div class='promo-banner'>50% off!</div><h2>FAQ</h2><p>" + para(rng, 80) + "</p></div>"
+        + footer() + "</body></html>"
+    )
+    pages["blog"] = (
+        head("Why We Rebuilt Sync", "") + "<body>" + nav()
+        + "<article class='post'><h1>Why we rebuilt sync</h1><div class='entry-content'>"
+        + "".join(f"<p>{para(rng, 70)}</p>" for i in range(12))
+        + "</div><div class='related-posts'><h2>Related posts</h2><ul>" + "".join(f"<li>{para(rng, 5)}</li>" for i in range(6))
+        + "</ul></div><div class='newsletter'>Subscribe</div></article>" + footer() + "</body></html>"
+    )
+    pages["spa_shell"] = (
+        "<!DOCTYPE html><html><head><title>Acme App</title><meta name='description' content='Acme single page application"
+        " dashboard for tenant admins and operators.'><script>" + "function f(){return 1};" * 8000
+        + "</script></head><body><noscript>Enable JS</noscript><div id='root'></div><script src='/bundle.js'></script></body></html>"
+    )
+    pages["legacy_table"] = (
+        "<html><head><title>Release Notes - Acme</title></head><body><table><tr><td><font>"
+        + "".join(f"<b>Version 3.{i}</b><br>{para(rng, 40)}<br><br>" for i in range(20))
+        + "</font></td></tr></table></body></html>"
+    )
+    pages["pathological_nesting"] = (
+        head("Deep Nesting", "Pathological markup with thousands of unclosed noise and content wrappers.") + "<body>"
+        + "<div class=\"sidebar-x\"><span class=\"share\">" * 600 + para(rng, 50)
+        + "<div class=\"content\">" * 400 + "<main>" + para(rng, 100) + "</body></html>"
+    )
+    pages["pathological_brackets"] = (
+        head("Comparison Operators", "Reference for comparison operators in the policy language.") + "<body><main><h1>Operators</h1>"
+        + "".join(f"<p>Use a < b and c << d when {para(rng, 8)}</p>" for i in range(400)) + "</main></body></html>"
+    )
+    pages["legacy_cp1252"] = (
+        "<!DOCTYPE html><html><head><meta http-equiv=\"Content-Type\" content=\"text/html; charset=windows-1252\">"
+        "<title>Société Générale – Notes de version</title><meta name=\"description\" content=\"Résumé des nouveautés"
+        " de la version 4.2 : sécurité, déploiement et rôles.\"></head><body><div id=\"content\"><h1>Notes de version 4.2</h1>"
+        + "".join(f"<h2>Amélioration n°{i}</h2><p>Le déploiement est désormais plus rapide grâce à la file d’attente."
+                  f" {para(rng, 30)}</p>" for i in range(10))
+        + "</div></body></html>"
+    )
+    return pages
+
+
+# ─────────────────────────────────────────────────────
+# MAIN
+# ─────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the synthetic HTML corpus used by run_bench.py.")
+    parser.add_argument("--out", default=CORPUS_DIR, help="directory to write the pages to")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    pages = build_pages()
+    for name, html in pages.items():
+        encoding = "cp1252" if name == "legacy_cp1252" else "utf-8"
+        with open(os.path.join(args.out, name + ".html"), "wb") as f:
+            f.write(html.encode(encoding))
+    print(f"Wrote {len(pages)} pages to {args.out}")
+
+if __name__ == "__main__":
+    main()
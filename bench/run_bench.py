@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import difflib
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+import page_fetch
+
+CORPUS_DIR = os.path.join(ROOT, "corpus")
+GOLDEN_DIR = os.path.join(ROOT, "golden")
+
+# The corpus is synthetic (see make_corpus.py). Golden outputs are kept per
+# extractor, under golden/<HTML_EXTRACTOR>/, since the two paths legitimately
+# differ on some pages.
+
+FUNCTIONS = {
+    "sniff_encoding"      : lambda page: page_fetch.sniff_encoding(page["raw"], None),
+    "extract_meta"        : lambda page: page_fetch.extract_meta(page["html"]),
+    "extract_main_content": lambda page: page_fetch.extract_main_content(page_fetch.strip_noise(page["html"])),
+    "tokenize_page"       : lambda page: page_fetch.tokenize_page(page["html"]),
+    "extract_page"        : lambda page: page_fetch.extract_page(page["html"]),
+}
+
+
+# ─────────────────────────────────────────────────────
+# CORPUS
+# ─────────────────────────────────────────────────────
+def load_corpus(only=None):
+    pages = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith(".html") or (only and not any(o in name for o in only)):
+            continue
+        with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+            raw = f.read()
+        pages.append({"name": name[:-5], "raw": raw, "html": raw.decode(page_fetch.sniff_encoding(raw, None), errors="replace")})
+    return pages
+
+def golden_path(page):
+    return os.path.join(GOLDEN_DIR, page_fetch.HTML_EXTRACTOR, page["name"] + ".txt")
+
+
+# ─────────────────────────────────────────────────────
+# BENCHMARK
+# ─────────────────────────────────────────────────────
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def bench(fn, pages, repeat):
+    samples, per_page = [], {}
+    for page in pages:
+        fn(page)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(page)
+            times.append(time.perf_counter() - t0)
+        samples.extend(times)
+        per_page[page["name"]] = percentile(times, 0.5)
+    return samples, per_page
+
+def report(name, samples, pages, repeat, per_page=None):
+    total = sum(samples)
+    mb    = sum(len(page["raw"]) for page in pages) * repeat / 1024 / 1024
+    print(f"{name:22} {len(samples) / total:9.1f} pages/s {mb / total:8.2f} MB/s"
+          f"   p50 {percentile(samples, 0.5) * 1000:8.2f} ms   p99 {percentile(samples, 0.99) * 1000:8.2f} ms")
+    for page_name, p50 in (per_page or {}).items():
+        print(f"    {page_name:26} p50 {p50 * 1000:8.2f} ms")
+
+
+# ─────────────────────────────────────────────────────
+# GOLDEN OUTPUTS
+# ─────────────────────────────────────────────────────
+def check_golden(pages, update=False):
+    failed = 0
+    os.makedirs(os.path.join(GOLDEN_DIR, page_fetch.HTML_EXTRACTOR), exist_ok=True)
+    for page in pages:
+        output = page_fetch.extract_page(page["html"]) or ""
+        path   = golden_path(page)
+        if update:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(output)
+            continue
+
+        if not os.path.exists(path):
+            print(f"✗ {page['name']}: no golden output (run with --update)")
+            failed += 1
+            continue
+        with open(path, encoding="utf-8") as f:
+            expected = f.read()
+        if output != expected:
+            failed += 1
+            print(f"✗ {page['name']}: output differs from golden")
+            diff = difflib.unified_diff(expected.splitlines(), output.splitlines(), "golden", "current", lineterm="")
+            print("\n".join("    " + line for line in diff))
+        else:
+            print(f"✓ {page['name']}")
+
+    if update:
+        print(f"Updated {len(pages)} golden outputs in {os.path.join(GOLDEN_DIR, page_fetch.HTML_EXTRACTOR)}")
+    return failed
+
+
+# ─────────────────────────────────────────────────────
+# MAIN
+# ─────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page extraction against the synthetic HTML corpus.")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per page and function")
+    parser.add_argument("--function", action="append", choices=sorted(FUNCTIONS), help="only benchmark these functions")
+    parser.add_argument("--page", action="append", help="only use corpus pages whose name contains this")
+    parser.add_argument("--per-page", action="store_true", help="also print the p50 latency of every page")
+    parser.add_argument("--extractor", choices=["tokenizer", "regex"], help="override HTML_EXTRACTOR")
+    parser.add_argument("--check", action="store_true", help="compare extract_page output with the golden files of the selected extractor")
+    parser.add_argument("--update", action="store_true", help="rewrite the golden files from the current output")
+    args = parser.parse_args()
+
+    if args.extractor:
+        page_fetch.HTML_EXTRACTOR = args.extractor
+    pages = load_corpus(args.page)
+    if not pages:
+        sys.exit("No corpus pages matched")
+
+    if args.check or args.update:
+        sys.exit(1 if check_golden(pages, update=args.update) else 0)
+
+    print(f"{len(pages)} pages · {sum(len(p['raw']) for p in pages) / 1024:.0f} KB · {args.repeat} runs each"
+          f" · HTML_EXTRACTOR={page_fetch.HTML_EXTRACTOR}\n")
+    for name in args.function or FUNCTIONS:
+        samples, per_page = bench(FUNCTIONS[name], pages, args.repeat)
+        report(name, samples, pages, args.repeat, per_page if args.per_page else None)
+
+if __name__ == "__main__":
+    main()
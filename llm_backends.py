@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import asyncio
+import threading
+import contextvars
+
+# Async completion backends shared by both apps. Each backend exposes
+#   await backend.complete(prompt, max_tokens, temperature, schema) -> reply dict
+#   await backend.warm()
+#   await backend.close()
+# and all of them run on one background event loop, so a pipeline stage can keep
+# hundreds of requests in flight without a thread per request. Synchronous code
+# reaches the loop through run() / submit().
+
+LLM_FAKE_LATENCY = float(os.environ.get("LLM_FAKE_LATENCY", 0))
+
+_loop      = None
+_loop_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────
+# EVENT LOOP
+# ─────────────────────────────────────────────────────
+def event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return _loop
+
+def submit(coro):
+    return asyncio.run_coroutine_threadsafe(in_caller_context(coro), event_loop())
+
+def run(coro):
+    loop = event_loop()
+    if threading.current_thread().name == "llm-event-loop":
+        coro.close()
+        raise RuntimeError("run() called from the LLM event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(in_caller_context(coro), loop).result()
+
+def in_caller_context(coro):
+    # Tasks run in a copy of the loop thread's context; give them the caller's
+    # context variables (the per-job stats counter) instead.
+    context = contextvars.copy_context()
+
+    async def restored():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return restored()
+
+async def gather_limited(coros, limit):
+    slots = asyncio.Semaphore(max(limit, 1))
+
+    async def bounded(coro):
+        async with slots:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))
+
+async def close_later(backend, delay):
+    await asyncio.sleep(delay)
+    await backend.close()
+
+def reply(text, prompt_tokens=0, completion_tokens=0, eval_ms=0, load_ms=0):
+    return {"text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "eval_ms": eval_ms, "load_ms": load_ms}
+
+
+# ─────────────────────────────────────────────────────
+# OPENAI
+# ─────────────────────────────────────────────────────
+def openai_response_format(schema):
+    return {"type": "json_schema", "json_schema": {"name": schema["name"], "strict": True, "schema": schema["schema"]}}
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, api_key, model, max_connections=100):
+        import httpx
+        from openai import AsyncOpenAI
+        self.model  = model
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0, http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=60),
+            timeout=httpx.Timeout(60, connect=10),
+        ))
+
+    async def complete(self, prompt, max_tokens=600, temperature=None, schema=None):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            **({"temperature": temperature} if temperature is not None else {}),
+            **({"response_format": openai_response_format(schema)} if schema else {}),
+        )
+        usage = response.usage
+        return reply(response.choices[0].message.content.strip(),
+                     usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+
+    async def warm(self):
+        pass
+
+    async def close(self):
+        await self.client.close()
+
+
+# ─────────────────────────────────────────────────────
+# OLLAMA
+# ─────────────────────────────────────────────────────
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self, model, options=None, keep_alive=None, host=None):
+        import ollama
+        self.model      = model
+        self.options    = options or {}
+        self.keep_alive = keep_alive
+        self.client     = ollama.AsyncClient(host=host)
+
+    async def complete(self, prompt, max_tokens=600, temperature=None, schema=None):
+        options = dict(self.options, num_predict=max_tokens, **({"temperature": temperature} if temperature is not None else {}))
+        response = await self.client.chat(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            options=options,
+            keep_alive=self.keep_alive,
+            **({"format": schema["schema"]} if schema else {}),
+        )
+        return reply(response["message"]["content"].strip(), response.get("prompt_eval_count") or 0,
+                     response.get("eval_count") or 0, (response.get("eval_duration") or 0) // 1000000,
+                     (response.get("load_duration") or 0) // 1000000)
+
+    async def warm(self):
+        response = await self.client.generate(model=self.model, prompt="", options=self.options, keep_alive=self.keep_alive)
+        return reply("", load_ms=(response.get("load_duration") or 0) // 1000000)
+
+    async def close(self):
+        await self.client.close()
+
+
+# ─────────────────────────────────────────────────────
+# FAKE
+# ─────────────────────────────────────────────────────
+# Replies are derived from the prompt, so runs are repeatable and need neither
+# an API key nor a model. tools/fake_batch_server.py serves the same replies.
+def field(text, name):
+    m = re.search(r"^" + name + r": (.*)$", text, re.MULTILINE)
+    return m.group(1).strip() if m else ""
+
+def summary_for(url, content):
+    slug  = re.sub(r"\.html?$", "", url.rstrip("/").split("/")[-1]) or "home"
+    title = field(content, "META TITLE") or field(content, "H1") or slug.replace("-", " ").replace("_", " ").title()
+    text  = " ".join(filter(None, [field(content, "META DESCRIPTION"), field(content, "CONTENT")]))
+    desc  = " ".join(re.split(r"(?<=[.!?])\s+", text)[:2])[:300] or f"Reference material published at {url}."
+    return {"title": title[:80], "description": desc}
+
+def fake_reply(prompt):
+    if '{"score"' in prompt:
+        return {"score": 4, "description": field(prompt, "Current description")}
+    if "Page B content:" in prompt:
+        content = prompt.split("Page B content:", 1)[1].split("Page B current description:")[0]
+        return {"description": summary_for(field(prompt, "Page B URL"), content)["description"]}
+    if "PAGES:" in prompt:
+        blocks = re.split(r"^=== PAGE \d+ ===$", prompt.split("PAGES:", 1)[1], flags=re.MULTILINE)[1:]
+        return {"pages": [dict(url=field(block, "URL"), **summary_for(field(block, "URL"), block)) for block in blocks]}
+    return summary_for(field(prompt, "URL"), prompt.split("Page content:", 1)[-1])
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self, latency=None):
+        self.latency = LLM_FAKE_LATENCY if latency is None else latency
+
+    async def complete(self, prompt, max_tokens=600, temperature=None, schema=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = json.dumps(fake_reply(prompt))
+        return reply(text, len(prompt) // 4, len(text) // 4, int(self.latency * 1000))
+
+    async def warm(self):
+        pass
+
+    async def close(self):
+        pass
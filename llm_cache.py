@@ -0,0 +1,88 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+LLM_CACHE_DB   = os.environ.get("LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_DAYS = float(os.environ.get("LLM_CACHE_DAYS", 30))
+LLM_CACHE_ROWS = int(os.environ.get("LLM_CACHE_ROWS", 100000))
+
+_stores      = 0
+_stores_lock = threading.Lock()
+_local       = threading.local()
+
+
+# ─────────────────────────────────────────────────────
+# STORAGE
+# ─────────────────────────────────────────────────────
+# One connection per thread, opened and set up once. Use it as `with connect() as
+# conn:` for a transaction. The async apps call lookup/store through
+# asyncio.to_thread, so this never blocks the event loop.
+def connect():
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    if LLM_CACHE_DB not in conns:
+        conns[LLM_CACHE_DB] = open_db()
+    return conns[LLM_CACHE_DB]
+
+def open_db():
+    conn = sqlite3.connect(LLM_CACHE_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+        key      TEXT PRIMARY KEY,
+        model    TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created  REAL NOT NULL,
+        used     REAL NOT NULL
+    )""")
+    return conn
+
+def cache_key(model, prompt, temperature):
+    return hashlib.sha256(f"{model}\0{temperature}\0{prompt}".encode("utf-8")).hexdigest()
+
+def lookup(model, prompt, temperature):
+    if not LLM_CACHE_DB:
+        return None
+    key, now = cache_key(model, prompt, temperature), time.time()
+    with connect() as conn:
+        row = conn.execute("SELECT response FROM responses WHERE key = ? AND created > ?",
+                           (key, now - LLM_CACHE_DAYS * 86400)).fetchone()
+        if row:
+            conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+    return row[0] if row else None
+
+def store(model, prompt, temperature, response):
+    global _stores
+    if not LLM_CACHE_DB:
+        return
+    now = time.time()
+    with connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO responses (key, model, response, created, used) VALUES (?, ?, ?, ?, ?)",
+                     (cache_key(model, prompt, temperature), model, response, now, now))
+    with _stores_lock:
+        _stores += 1
+        due = _stores % 200 == 1
+    if due:
+        evict()
+
+def evict():
+    with connect() as conn:
+        conn.execute("DELETE FROM responses WHERE created <= ?", (time.time() - LLM_CACHE_DAYS * 86400,))
+        conn.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                     (LLM_CACHE_ROWS,))
+
+
+# ─────────────────────────────────────────────────────
+# REPORTING
+# ─────────────────────────────────────────────────────
+def stat_key(stage, hit):
+    return f"llm_cache_{'hits' if hit else 'misses'}:{stage}"
+
+def stats_msg(delta):
+    parts = []
+    for stage in sorted({key.split(":", 1)[1] for key in delta if key.startswith("llm_cache_")}):
+        hits, misses = delta.get(stat_key(stage, True), 0), delta.get(stat_key(stage, False), 0)
+        parts.append(f"{stage} {hits}/{hits + misses} ({hits * 100 // max(hits + misses, 1)}%)")
+    return "LLM cache hits: " + " · ".join(parts) if parts else ""
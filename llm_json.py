@@ -0,0 +1,165 @@
+import re
+import json
+
+# JSON schemas for the replies both apps ask for. Strict-mode compatible: every
+# property is required and no extra keys are allowed.
+SUMMARY_SCHEMA = {
+    "name": "summary",
+    "schema": {
+        "type": "object",
+        "properties": {"title": {"type": "string"}, "description": {"type": "string"}},
+        "required": ["title", "description"],
+        "additionalProperties": False,
+    },
+}
+
+BATCH_SCHEMA = {
+    "name": "summaries",
+    "schema": {
+        "type": "object",
+        "properties": {"pages": {"type": "array", "items": {
+            "type": "object",
+            "properties": {"url": {"type": "string"}, "title": {"type": "string"}, "description": {"type": "string"}},
+            "required": ["url", "title", "description"],
+            "additionalProperties": False,
+        }}},
+        "required": ["pages"],
+        "additionalProperties": False,
+    },
+}
+
+RESCORE_SCHEMA = {
+    "name": "rescore",
+    "schema": {
+        "type": "object",
+        "properties": {"score": {"type": "integer"}, "description": {"type": "string"}},
+        "required": ["score", "description"],
+        "additionalProperties": False,
+    },
+}
+
+DIFFERENTIATE_SCHEMA = {
+    "name": "differentiate",
+    "schema": {
+        "type": "object",
+        "properties": {"description": {"type": "string"}},
+        "required": ["description"],
+        "additionalProperties": False,
+    },
+}
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+LITERALS = {"True": "true", "False": "false", "None": "null"}
+CLOSERS  = {"{": "}", "[": "]"}
+ESCAPES  = set('"\\/bfnrtu')
+_decoder = json.JSONDecoder()
+
+
+# ─────────────────────────────────────────────────────
+# PARSING
+# ─────────────────────────────────────────────────────
+def parse(raw):
+    text = raw.strip()
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    m = FENCE_RE.match(text)
+    if m:
+        text = m.group(1).strip()
+        try:
+            return json.loads(text), False
+        except ValueError:
+            pass
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("no JSON object in reply")
+    try:
+        return _decoder.raw_decode(text, start)[0], True
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair(text[start:])), True
+    except Exception as e:
+        raise ValueError(f"unrepairable JSON reply: {e}") from None
+
+def repair(text):
+    out, stack, quote, i, n = [], [], None, 0, len(text)
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else text[i:i + 2] if nxt in ESCAPES else "\\\\" + nxt)
+                i += 2
+                continue
+            if c == quote and closes_string(text, i + 1):
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+            elif c == "\n":
+                out.append("\\n")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c in "\"'":
+            out.append('"')
+            quote = c
+        elif c in CLOSERS:
+            stack.append(CLOSERS[c])
+            out.append(c)
+        elif c in "}]":
+            drop_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break
+        elif c.isalpha() or c == "_":
+            word = re.match(r"\w+", text[i:]).group(0)
+            i += len(word)
+            if text[i:].lstrip().startswith(":"):
+                out.append(f'"{word}"')
+            else:
+                out.append(LITERALS.get(word, word))
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote:
+        out.append('"')
+    if stack:
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            out.append(" null")
+        drop_trailing_comma(out)
+        out.extend(reversed(stack))
+    return "".join(out)
+
+# A quote only ends a string when what follows could come after a JSON string;
+# otherwise it is part of the text, as in "the "best" tool" or 'it's fast'.
+def closes_string(text, i):
+    rest = text[i:].lstrip()
+    return not rest or rest[0] in ",:}]"
+
+def drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+# ─────────────────────────────────────────────────────
+# REPORTING
+# ─────────────────────────────────────────────────────
+def stats_msg(delta):
+    ok, repaired, failed = (delta.get(k, 0) for k in ("llm_parse_ok", "llm_parse_repaired", "llm_parse_failed"))
+    total = ok + repaired + failed
+    if not total:
+        return ""
+    return (f"LLM replies: {total} parsed · {repaired} repaired · {failed} unparseable"
+            f" ({failed * 100 / total:.1f}% parse failures)")
@@ -0,0 +1,961 @@
+import re
+import json
+import time
+import os
+import socket
+import hashlib
+import requests
+import io
+import gzip
+import codecs
+import html as html_lib
+import threading
+import contextvars
+import queue
+import multiprocessing
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse, urlunparse
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError
+from stats import bump, stats_snapshot, stats_since
+
+# Page fetching and extraction shared by both apps: the pooled HTTP session with
+# its DNS cache, the on-disk HTTP cache, per-domain throttling, sitemap parsing
+# and the HTML extractors. Counters go through stats.bump, so they land in the
+# job that called fetch_pages / parse_sitemap.
+
+HEADERS         = {"User-Agent": "Mozilla/5.0 (compatible; llms-txt-generator/1.0)"}
+FETCH_WORKERS   = int(os.environ.get("FETCH_WORKERS", 16))
+FETCH_PER_HOST  = int(os.environ.get("FETCH_PER_HOST", 4))
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 32))
+HTTP_POOL_SIZE  = int(os.environ.get("HTTP_POOL_SIZE", 8))
+DNS_CACHE_TTL   = int(os.environ.get("DNS_CACHE_TTL", 300))
+DNS_CACHE_HOSTS = int(os.environ.get("DNS_CACHE_HOSTS", 1024))
+HTTP_CACHE_DIR  = os.environ.get("HTTP_CACHE_DIR", "")
+HTTP_CACHE_MB   = int(os.environ.get("HTTP_CACHE_MB", 200))
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", 1024 * 1024))
+FETCH_START_RPS = float(os.environ.get("FETCH_START_RPS", 5))
+FETCH_MIN_RPS   = float(os.environ.get("FETCH_MIN_RPS", 0.5))
+FETCH_MAX_RPS   = float(os.environ.get("FETCH_MAX_RPS", 50))
+HTML_EXTRACTOR  = os.environ.get("HTML_EXTRACTOR", "tokenizer")
+EXTRACT_BUDGET  = float(os.environ.get("EXTRACT_BUDGET", 2.0))
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", 0))
+
+SITEMAP_WORKERS   = int(os.environ.get("SITEMAP_WORKERS", 8))
+SITEMAP_MAX_DEPTH = int(os.environ.get("SITEMAP_MAX_DEPTH", 3))
+
+
+# URL UTILITIES
+# ─────────────────────────────────────────────────────
+def clean_url(url):
+    try:
+        parsed = urlparse(url)
+        path   = re.sub(r'/{2,}', '/', parsed.path)
+        return urlunparse((parsed.scheme, parsed.netloc, path, '', '', ''))
+    except:
+        return url
+
+def unique_urls(urls):
+    seen = set()
+    for url in urls:
+        url = clean_url(url)
+        if url not in seen:
+            seen.add(url)
+            yield url
+
+# ─────────────────────────────────────────────────────
+# HTTP CLIENT
+# ─────────────────────────────────────────────────────
+# Only page fetches go through this cache (via the connection classes below);
+# the LLM clients resolve as usual. getaddrinfo does not expose record TTLs, so
+# DNS_CACHE_TTL is an upper bound and a host is re-resolved as soon as none of
+# its cached addresses accept a connection.
+_dns_cache      = OrderedDict()
+_dns_cache_lock = threading.Lock()
+
+def resolve(host, port):
+    key = (host, port)
+    now = time.monotonic()
+    with _dns_cache_lock:
+        hit = _dns_cache.get(key)
+        if hit and hit[0] > now:
+            _dns_cache.move_to_end(key)
+    if hit and hit[0] > now:
+        bump("dns_hits")
+        return hit[1]
+    addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)))
+    bump("dns_misses")
+    with _dns_cache_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, addresses)
+        _dns_cache.move_to_end(key)
+        while len(_dns_cache) > DNS_CACHE_HOSTS:
+            _dns_cache.popitem(last=False)
+    return addresses
+
+def forget_host(host, port):
+    with _dns_cache_lock:
+        _dns_cache.pop((host, port), None)
+
+class CachedDNSMixin:
+    def _new_conn(self):
+        host = self._dns_host
+        if DNS_CACHE_TTL <= 0:
+            return super()._new_conn()
+        try:
+            addresses = resolve(host, self.port)
+        except OSError:
+            return super()._new_conn()
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError:
+                    if i == len(addresses) - 1:
+                        forget_host(host, self.port)
+                        raise
+        finally:
+            self._dns_host = host
+
+class CachedDNSHTTPConnection(CachedDNSMixin, HTTPConnection):
+    pass
+
+class CachedDNSHTTPSConnection(CachedDNSMixin, HTTPSConnection):
+    pass
+
+class CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        bump("pool_hits" if getattr(conn, "sock", None) is not None else "pool_misses")
+        return conn
+
+class CountingHTTPConnectionPool(CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = CachedDNSHTTPConnection
+
+class CountingHTTPSConnectionPool(CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = CachedDNSHTTPSConnection
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http" : CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+http_session = requests.Session()
+http_session.headers.update(HEADERS)
+_adapter = PooledAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+http_session.mount("http://", _adapter)
+http_session.mount("https://", _adapter)
+
+# ─────────────────────────────────────────────────────
+# HTTP CACHE
+# ─────────────────────────────────────────────────────
+_cache_size = None
+_cache_lock = threading.Lock()
+
+def cache_path(url):
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha256(clean_url(url).encode("utf-8")).hexdigest() + ".json")
+
+def cache_load(url):
+    if not HTTP_CACHE_DIR:
+        return None
+    try:
+        with open(cache_path(url), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cache_touch(url):
+    try:
+        os.utime(cache_path(url))
+    except OSError:
+        pass
+
+def cache_store(url, headers, body):
+    global _cache_size
+    etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+    if not HTTP_CACHE_DIR or not (etag or last_modified):
+        return
+    data = json.dumps({"url": clean_url(url), "etag": etag, "last_modified": last_modified, "body": body})
+    path = cache_path(url)
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        return
+    with _cache_lock:
+        if _cache_size is None:
+            _cache_size = sum(e.stat().st_size for e in os.scandir(HTTP_CACHE_DIR) if e.name.endswith(".json"))
+        else:
+            _cache_size += len(data)
+        if _cache_size > HTTP_CACHE_MB * 1024 * 1024:
+            cache_evict()
+
+def cache_evict():
+    global _cache_size
+    entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(HTTP_CACHE_DIR) if e.name.endswith(".json"))
+    _cache_size = sum(size for _, size, _ in entries)
+    target      = HTTP_CACHE_MB * 1024 * 1024 * 0.9
+    for _, size, path in entries:
+        if _cache_size <= target:
+            break
+        try:
+            os.remove(path)
+            _cache_size -= size
+        except OSError:
+            pass
+
+# ─────────────────────────────────────────────────────
+# DOMAIN THROTTLING
+# ─────────────────────────────────────────────────────
+class DomainThrottle:
+    def __init__(self):
+        self.lock      = threading.Lock()
+        self.rate      = FETCH_START_RPS
+        self.next_slot = 0.0
+        self.last_cut  = 0.0
+        self.latency   = None
+        self.baseline  = None
+        self.completed = deque(maxlen=20)
+
+    def wait(self):
+        with self.lock:
+            slot           = max(time.monotonic(), self.next_slot)
+            self.next_slot = slot + 1.0 / self.rate
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    # status is None when the request raised (timeout, reset): back off as for a 503.
+    def record(self, status, latency, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self.completed.append(now)
+            self.latency  = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.baseline = self.latency if self.baseline is None else min(self.baseline, self.latency)
+
+            if status is None or status in (429, 503):
+                self.rate     = max(FETCH_MIN_RPS, self.rate / 2)
+                self.last_cut = now
+                if retry_after:
+                    self.next_slot = max(self.next_slot, now + retry_after)
+            elif self.latency > 2 * self.baseline + 0.05:
+                if now - self.last_cut > self.latency:
+                    self.rate     = max(FETCH_MIN_RPS, self.rate * 0.75)
+                    self.last_cut = now
+            elif status < 300:
+                self.rate = min(FETCH_MAX_RPS, self.rate + 0.5)
+
+    def rps(self):
+        with self.lock:
+            if len(self.completed) < 2 or self.completed[-1] == self.completed[0]:
+                return 0.0
+            return (len(self.completed) - 1) / (self.completed[-1] - self.completed[0])
+
+_throttles      = {}
+_throttles_lock = threading.Lock()
+
+def domain_throttle(url):
+    host = urlparse(url).netloc.lower()
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = DomainThrottle()
+        return _throttles[host]
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), 120.0)
+
+# ─────────────────────────────────────────────────────
+# SITEMAP PARSING
+# ─────────────────────────────────────────────────────
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+def open_sitemap(url, timeout=10):
+    r = http_session.get(url, timeout=timeout, stream=True)
+    if r.status_code != 200:
+        r.close()
+        return None, f"Could not fetch sitemap (HTTP {r.status_code})"
+    r.raw.decode_content = True
+    r.raw.auto_close     = False
+    return r, None
+
+def iter_sitemap(stream):
+    stream = io.BufferedReader(stream)
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+
+    entry = {}
+    try:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end":
+                continue
+            tag = elem.tag[len(SITEMAP_NS):] if elem.tag.startswith(SITEMAP_NS) else elem.tag
+            if tag in ("loc", "lastmod", "priority"):
+                entry[tag] = (elem.text or "").strip()
+            elif tag in ("url", "sitemap"):
+                if entry.get("loc"):
+                    yield tag, entry
+                entry = {}
+                root.clear()
+    except (ET.ParseError, OSError, EOFError, ValueError, StopIteration):
+        pass
+
+def expand_sitemap(stream, source_url=None, response=None):
+    # Every sitemap gets its own feed of entries, and a child sitemap is queued in
+    # its parent's feed as a nested feed. Children load concurrently, but draining
+    # the feeds depth-first yields URLs in document order on every run.
+    seen   = {clean_url(source_url)} if source_url else set()
+    lock   = threading.Lock()
+    closed = False
+
+    def submit(feed, loc, depth):
+        key = clean_url(loc)
+        with lock:
+            if key in seen:
+                bump("sitemap_cycles")
+                return
+            if depth > SITEMAP_MAX_DEPTH:
+                bump("sitemap_too_deep")
+                return
+            seen.add(key)
+        child = queue.Queue()
+        feed.put(child)
+        pool.submit(contextvars.copy_context().run, load_child, child, loc, depth)
+
+    def load_child(feed, loc, depth):
+        try:
+            r, _ = open_sitemap(loc)
+            if r is not None:
+                with r:
+                    for kind, entry in iter_sitemap(r.raw):
+                        if closed:
+                            break
+                        if kind == "sitemap":
+                            submit(feed, entry["loc"], depth + 1)
+                        else:
+                            feed.put(entry)
+        except Exception:
+            pass
+        finally:
+            feed.put(None)
+
+    def drain(feed):
+        while (item := feed.get()) is not None:
+            if isinstance(item, queue.Queue):
+                yield from drain(item)
+            else:
+                yield item
+
+    pool, feed, nested = ThreadPoolExecutor(max_workers=SITEMAP_WORKERS), queue.Queue(), False
+    try:
+        for kind, entry in iter_sitemap(stream):
+            if kind == "sitemap":
+                nested = True
+                submit(feed, entry["loc"], 1)
+            elif nested:
+                feed.put(entry)
+            else:
+                yield entry
+        if response is not None:
+            response.close()
+        feed.put(None)
+        yield from drain(feed)
+    finally:
+        closed = True
+        if response is not None:
+            response.close()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_sitemap(source, is_file=False):
+    if is_file:
+        data = source.encode("utf-8") if isinstance(source, str) else source
+        return expand_sitemap(io.BytesIO(data)), None
+    try:
+        r, err = open_sitemap(source, timeout=15)
+    except Exception as e:
+        return [], str(e)
+    if err:
+        return [], err
+    return expand_sitemap(r.raw, source, r), None
+
+def sitemap_locs(entries, lastmods):
+    for entry in entries:
+        if entry.get("lastmod"):
+            lastmods[clean_url(entry["loc"])] = entry["lastmod"]
+        yield entry["loc"]
+
+def parse_lastmod(value):
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# ─────────────────────────────────────────────────────
+# PAGE FETCHING
+# ─────────────────────────────────────────────────────
+HEAD_END_RE = re.compile(r"</head\s*>", re.IGNORECASE)
+H1_RE       = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+H2_RE       = re.compile(r"<h2[^>]*>(.*?)</h2>", re.IGNORECASE | re.DOTALL)
+
+def extract_meta(html):
+    def clean(s):
+        s = re.sub(r"<[^>]+>", " ", s)
+        s = re.sub(r"&amp;", "&", s)
+        s = re.sub(r"&quot;", '"', s)
+        s = re.sub(r"&#39;", "'", s)
+        s = re.sub(r"&[a-z]+;", " ", s)
+        return re.sub(r"\s+", " ", s).strip()
+
+    m        = HEAD_END_RE.search(html)
+    head     = html[:m.start()] if m else html
+    body_pos = m.end() if m else 0
+
+    m = re.search(r"<title[^>]*>(.*?)</title>", head, re.IGNORECASE | re.DOTALL)
+    meta_title = clean(m.group(1)) if m else ""
+    meta_title = re.split(r"\s*[|\u2013\u2014]\s*", meta_title)[0].strip()
+
+    m = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\'](.*?)["\']', head, re.IGNORECASE | re.DOTALL)
+    if not m:
+        m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+name=["\']description["\']', head, re.IGNORECASE | re.DOTALL)
+    meta_desc = clean(m.group(1)) if m else ""
+
+    if not meta_desc:
+        m = re.search(r'<meta[^>]+property=["\']og:description["\'][^>]+content=["\'](.*?)["\']', head, re.IGNORECASE | re.DOTALL)
+        if not m:
+            m = re.search(r'<meta[^>]+content=["\'](.*?)["\'"][^>]+property=["\']og:description["\']', head, re.IGNORECASE | re.DOTALL)
+        meta_desc = clean(m.group(1)) if m else ""
+
+    if not meta_title:
+        m = re.search(r'<meta[^>]+property=["\']og:title["\'][^>]+content=["\'](.*?)["\']', head, re.IGNORECASE | re.DOTALL)
+        meta_title = clean(m.group(1)) if m else ""
+
+    m = H1_RE.search(html, body_pos)
+    h1 = clean(m.group(1)) if m else ""
+
+    h2s = []
+    for m in H2_RE.finditer(html, body_pos):
+        h2 = clean(m.group(1))
+        if len(h2) > 3:
+            h2s.append(h2)
+            if len(h2s) == 6:
+                break
+
+    return {
+        "meta_title": meta_title[:200],
+        "meta_desc" : meta_desc[:400],
+        "h1"        : h1[:150],
+        "h2s"       : " | ".join(h2s)[:300] if h2s else "",
+    }
+
+NOISE_TAGS   = ["script", "style", "nav", "footer", "header", "aside", "noscript", "iframe", "svg", "form"]
+NOISE_WORDS  = ["sidebar", "widget", "banner", "promo", "advertisement",
+                "breadcrumb", "pagination", "related", "social", "share",
+                "cookie", "popup", "modal", "overlay", "newsletter"]
+MAIN_IDS     = ["content", "main", "main-content", "page-content", "article", "primary"]
+MAIN_CLASSES = ["content", "main", "article", "entry-content", "post-content"]
+
+def extract_main_content(html):
+    for tag in ["main", "article"]:
+        pat = re.compile(r"<" + tag + r"[^>]*>(.*?)</" + tag + r">", re.DOTALL | re.IGNORECASE)
+        m = pat.search(html)
+        if m and len(m.group(1)) > 200:
+            return m.group(1)
+
+    pat = re.compile(r'<[^>]+role="main"[^>]*>(.*?)</(?:div|section|main)>', re.DOTALL | re.IGNORECASE)
+    m = pat.search(html)
+    if m and len(m.group(1)) > 200:
+        return m.group(1)
+
+    for id_val in MAIN_IDS:
+        pat = re.compile(r'<(?:div|section)[^>]+id="' + id_val + r'"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
+        m = pat.search(html)
+        if m and len(m.group(1)) > 200:
+            return m.group(1)
+
+    for cls_val in MAIN_CLASSES:
+        pat = re.compile(r'<(?:div|section)[^>]+class="[^"]*' + cls_val + r'[^"]*"[^>]*>(.*?)</(?:div|section)>', re.DOTALL | re.IGNORECASE)
+        m = pat.search(html)
+        if m and len(m.group(1)) > 200:
+            return m.group(1)
+
+    return html
+
+HTML_TYPES      = ("text/html", "application/xhtml+xml")
+CHARSET_RE      = re.compile(r"""charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+CHARSET_META_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+BOMS            = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+
+def known_codec(name):
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+def sniff_encoding(body, content_type):
+    m = CHARSET_RE.search(content_type or "")
+    if m and known_codec(m.group(1)):
+        return m.group(1)
+    for bom, codec in BOMS:
+        if body.startswith(bom):
+            return codec
+    m = CHARSET_META_RE.search(body, 0, 4096)
+    if m and known_codec(m.group(1).decode("ascii")):
+        return m.group(1).decode("ascii")
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(body)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    bump("charset_detected")
+    return chardet.detect(body[:64 * 1024]).get("encoding") or "utf-8"
+
+def read_html(r):
+    chunks, size, tail, head_done = [], 0, b"", False
+    for chunk in r.iter_content(16 * 1024):
+        chunks.append(chunk)
+        size  += len(chunk)
+        window = (tail + chunk).lower()
+        tail   = window[-16:]
+        head_done = head_done or b"</head>" in window
+        if head_done and size >= 64 * 1024 and (b"</main>" in window or b"</article>" in window):
+            bump("fetch_early_stops")
+            break
+        if FETCH_MAX_BYTES and size >= FETCH_MAX_BYTES:
+            bump("fetch_truncated")
+            break
+    bump("fetch_bytes", size)
+    body = b"".join(chunks)
+    return body.decode(sniff_encoding(body, r.headers.get("Content-Type")), errors="replace")
+
+# close() on a response with unread body drops its socket. Reading a short
+# leftover body first (304s, error pages, small non-HTML replies) lets urllib3
+# put the connection back in the pool; anything longer is not worth downloading.
+DRAIN_MAX_BYTES = 64 * 1024
+
+def release(r):
+    try:
+        if int(r.headers.get("Content-Length") or 0) <= DRAIN_MAX_BYTES:
+            r.raw.read(DRAIN_MAX_BYTES + 1, decode_content=False)
+    except Exception:
+        pass
+    r.close()
+
+def fetch_html(url):
+    cached  = cache_load(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    throttle = domain_throttle(url)
+    for attempt in range(3):
+        throttle.wait()
+        started = time.monotonic()
+        try:
+            r = http_session.get(url, headers=headers, timeout=10, stream=True)
+        except requests.RequestException:
+            bump("fetch_errors")
+            throttle.record(None, time.monotonic() - started)
+            raise
+        throttle.record(r.status_code, r.elapsed.total_seconds(), parse_retry_after(r.headers.get("Retry-After")))
+        if r.status_code not in (429, 503):
+            break
+        bump("fetch_throttled")
+        release(r)
+
+    with r:
+        if r.status_code == 304 and cached:
+            release(r)
+            bump("cache_hits")
+            cache_touch(url)
+            return cached["body"]
+        if r.status_code != 200:
+            release(r)
+            return None
+
+        content_type = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_TYPES:
+            release(r)
+            bump("fetch_skipped_type")
+            return None
+
+        html = read_html(r)
+        if HTTP_CACHE_DIR:
+            bump("cache_misses")
+            cache_store(url, r.headers, html)
+        return html
+
+def strip_noise(html):
+    for tag in NOISE_TAGS:
+        html = re.sub(r"<" + tag + r"[^>]*>.*?</" + tag + r">", " ", html, flags=re.DOTALL | re.IGNORECASE)
+
+    for noise in NOISE_WORDS:
+        pat = re.compile(
+            r'<(?:div|section|ul|span)[^>]+(?:class|id)="[^"]*' + noise + r'[^"]*"[^>]*>.*?</(?:div|section|ul|span)>',
+            re.DOTALL | re.IGNORECASE
+        )
+        html = pat.sub(" ", html)
+    return html
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+TAG_RE    = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^>]*)>")
+# Every match consumes a whole name (plus its value when it has one), so findall
+# never rescans the characters of an unclosed value or of a long bare token.
+ATTR_RE   = re.compile(r"""([^\s"'>/=]+)(?:\s*(=)\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+ATTR_MAX  = 8 * 1024
+RAW_END   = {tag: re.compile(r"</" + tag + r"\s*>", re.IGNORECASE) for tag in ("script", "style")}
+
+class ExtractBudgetExceeded(Exception):
+    pass
+
+class PageScanner:
+    def __init__(self):
+        self.stack    = []
+        self.open     = {}
+        self.noise_at = None
+        self.regions  = {}
+        self.active   = []
+        self.doc      = []
+        self.meta     = {}
+        self.title    = None
+        self.in_title = False
+        self.heading  = None
+        self.h1       = None
+        self.h2s      = []
+
+    def text(self, data):
+        if self.in_title:
+            self.title.append(data)
+        if self.heading:
+            self.heading[1].append(data)
+        if self.noise_at is None:
+            self.doc.append(data)
+            for key in self.active:
+                region     = self.regions[key]
+                region[1].append(data)
+                region[2] += len(data)
+
+    def start(self, tag, attr_text, size):
+        attrs = {}
+        if attr_text and (tag in ("div", "section", "ul", "span", "main", "article", "meta") or "role" in attr_text):
+            for name, eq, v1, v2, v3 in ATTR_RE.findall(attr_text[:ATTR_MAX]):
+                if eq:
+                    attrs.setdefault(name.lower(), v1 or v2 or v3)
+
+        if tag == "meta":
+            name    = (attrs.get("name") or attrs.get("property") or "").lower()
+            content = attrs.get("content")
+            if content is not None and name in ("description", "og:description", "og:title"):
+                self.meta.setdefault(name, content)
+        elif tag == "title" and self.title is None:
+            self.title, self.in_title = [], True
+        elif self.heading is None and (tag == "h1" and self.h1 is None or tag == "h2" and len(self.h2s) < 6):
+            self.heading = (tag, [])
+
+        if self.active and self.noise_at is None:
+            for key in self.active:
+                self.regions[key][2] += size
+        if tag in VOID_TAGS or attr_text.endswith("/"):
+            return
+
+        self.stack.append(tag)
+        self.open[tag] = self.open.get(tag, 0) + 1
+        if self.noise_at is not None:
+            return
+        if tag in NOISE_TAGS or (tag in ("div", "section", "ul", "span") and self.is_noise(attrs)):
+            self.noise_at = len(self.stack)
+            return
+        for key in self.region_keys(tag, attrs):
+            if key not in self.regions:
+                self.regions[key] = [len(self.stack), [], 0]
+                self.active.append(key)
+
+    def end(self, tag):
+        if tag == "title" and self.in_title:
+            self.in_title = False
+        if self.heading and self.heading[0] == tag:
+            text = re.sub(r"\s+", " ", html_lib.unescape(" ".join(self.heading[1]))).strip()
+            if tag == "h1" and self.h1 is None:
+                self.h1 = text
+            elif tag == "h2" and len(text) > 3:
+                self.h2s.append(text)
+            self.heading = None
+        if not self.open.get(tag):
+            return
+
+        while self.stack:
+            depth = len(self.stack)
+            if self.noise_at == depth:
+                self.noise_at = None
+            if self.active:
+                self.active = [key for key in self.active if self.regions[key][0] != depth]
+            popped = self.stack.pop()
+            self.open[popped] -= 1
+            if popped == tag:
+                break
+
+    def is_noise(self, attrs):
+        names = ((attrs.get("class") or "") + " " + (attrs.get("id") or "")).lower()
+        return any(word in names for word in NOISE_WORDS)
+
+    def region_keys(self, tag, attrs):
+        keys = []
+        if tag in ("main", "article"):
+            keys.append(("tag", tag))
+        if (attrs.get("role") or "").lower() == "main":
+            keys.append(("role", "main"))
+        if tag in ("div", "section"):
+            id_val = (attrs.get("id") or "").lower()
+            if id_val in MAIN_IDS:
+                keys.append(("id", id_val))
+            cls_val = (attrs.get("class") or "").lower()
+            keys.extend(("class", c) for c in MAIN_CLASSES if c in cls_val)
+        return keys
+
+    def feed(self, html, deadline=None):
+        find, match, text = html.find, TAG_RE.match, self.text
+        pos, n, gt, steps = 0, len(html), -1, 0
+        while pos < n:
+            steps += 1
+            if deadline and not steps & 0x3ff and time.thread_time() > deadline:
+                raise ExtractBudgetExceeded()
+            lt = find("<", pos)
+            if lt < 0:
+                text(html[pos:])
+                break
+            if lt > pos:
+                text(html[pos:lt])
+
+            if html[lt + 1:lt + 2] in ("!", "?"):
+                if html.startswith("<!--", lt):
+                    close = find("-->", lt + 4)
+                    pos   = n if close < 0 else close + 3
+                else:
+                    close = find(">", lt)
+                    pos   = n if close < 0 else close + 1
+                continue
+
+            if gt < lt:
+                gt = find(">", lt)
+                if gt < 0:
+                    text(html[lt:])
+                    break
+            m = match(html, lt)
+            if not m:
+                text("<")
+                pos = lt + 1
+                continue
+
+            pos = m.end()
+            closing, tag, attr_text = m.groups()
+            tag = tag.lower()
+            if closing:
+                self.end(tag)
+                continue
+            self.start(tag, attr_text, pos - lt)
+            if tag in RAW_END and not attr_text.endswith("/"):
+                close = RAW_END[tag].search(html, pos)
+                pos   = n if close is None else close.end()
+                self.end(tag)
+
+    def main_text(self):
+        for key in ([("tag", "main"), ("tag", "article"), ("role", "main")]
+                    + [("id", v) for v in MAIN_IDS] + [("class", v) for v in MAIN_CLASSES]):
+            region = self.regions.get(key)
+            if region and region[2] > 200:
+                return " ".join(region[1])
+        return " ".join(self.doc)
+
+def tokenize_page(html, budget=None):
+    scanner = PageScanner()
+    scanner.feed(html, budget and time.thread_time() + budget)
+
+    def clean(s):
+        return re.sub(r"\s+", " ", html_lib.unescape(s or "")).strip()
+
+    meta_title = re.split(r"\s*[|\u2013\u2014]\s*", clean(" ".join(scanner.title or [])))[0].strip()
+    meta_title = meta_title or clean(scanner.meta.get("og:title"))
+    meta_desc  = clean(scanner.meta.get("description")) or clean(scanner.meta.get("og:description"))
+    h2s        = scanner.h2s[:6]
+    meta = {
+        "meta_title": meta_title[:200],
+        "meta_desc" : meta_desc[:400],
+        "h1"        : (scanner.h1 or "")[:150],
+        "h2s"       : " | ".join(h2s)[:300] if h2s else "",
+    }
+    return meta, html_lib.unescape(scanner.main_text())
+
+EXTRACT_HEAD_MAX = 64 * 1024
+
+def head_meta(html):
+    m = re.search(r"</head\s*>", html[:EXTRACT_HEAD_MAX], re.IGNORECASE)
+    meta, _ = tokenize_page(html[:m.start() if m else EXTRACT_HEAD_MAX])
+    return meta
+
+def extract_page(raw_html):
+    if HTML_EXTRACTOR == "regex":
+        meta = extract_meta(raw_html)
+        body = re.sub(r"<[^>]+>", " ", extract_main_content(strip_noise(raw_html)))
+    else:
+        try:
+            meta, body = tokenize_page(raw_html, EXTRACT_BUDGET)
+        except ExtractBudgetExceeded:
+            bump("extract_budget_hits")
+            meta, body = head_meta(raw_html), ""
+    body = re.sub(r"\+\d[\d\s\-(). ]{7,20}", " ", body)
+    body = re.sub(r"[A-Fa-f0-9]{40,}", " ", body)
+    body = re.sub(r"\s+", " ", body).strip()
+
+    parts = []
+    if meta["meta_title"]:
+        parts.append(f"META TITLE: {meta['meta_title']}")
+    if meta["meta_desc"]:
+        parts.append(f"META DESCRIPTION: {meta['meta_desc']}")
+    if meta["h1"] and meta["h1"].lower() != meta["meta_title"].lower():
+        parts.append(f"H1: {meta['h1']}")
+    if meta["h2s"]:
+        parts.append(f"H2s: {meta['h2s']}")
+    if body:
+        parts.append(f"CONTENT: {body[:2000]}")
+
+    structured = "\n".join(parts)
+    return structured if len(structured) > 100 else None
+
+_extract_pool      = None
+_extract_pool_lock = threading.Lock()
+
+def extract_pool():
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _extract_pool
+
+def extract_worker(raw_html):
+    before = stats_snapshot()
+    return extract_page(raw_html), stats_since(before)
+
+def extract_offloaded(raw_html):
+    global _extract_pool
+    pool = extract_pool()
+    try:
+        content, delta = pool.submit(extract_worker, raw_html).result()
+    except BrokenProcessPool:
+        with _extract_pool_lock:
+            if _extract_pool is pool:
+                _extract_pool = None
+        bump("extract_pool_restarts")
+        return extract_page(raw_html)
+    for key, n in delta.items():
+        bump(key, n)
+    return content
+
+def fetch_page(url):
+    try:
+        raw_html = fetch_html(url)
+        if raw_html is None:
+            return None
+        return extract_offloaded(raw_html) if EXTRACT_WORKERS else extract_page(raw_html)
+    except:
+        return None
+
+# A host never holds more than FETCH_PER_HOST pool threads: URLs for a busy host
+# wait in its backlog, and a worker that finishes one of the host's URLs takes
+# the next from that backlog. Other hosts' URLs keep the remaining threads.
+def fetch_pages(urls, progress_q=None):
+    total   = len(urls) if isinstance(urls, list) else None
+    order   = []
+    results = {}
+    lock    = threading.Lock()
+    done    = 0
+    active  = defaultdict(int)
+    backlog = defaultdict(deque)
+
+    def worker(url, host):
+        nonlocal done
+        while url:
+            content = fetch_page(url)
+            with lock:
+                results[url] = content
+                done        += 1
+                if progress_q:
+                    progress_q.put({"type": "fetch", "current": done, "total": total or len(order), "url": url, "ok": content is not None,
+                                    "rps": round(domain_throttle(url).rps(), 1)})
+                url = backlog[host].popleft() if backlog[host] else None
+                if url is None:
+                    active[host] -= 1
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for url in urls:
+            host = urlparse(url).netloc.lower()
+            with lock:
+                order.append(url)
+                if active[host] >= FETCH_PER_HOST:
+                    backlog[host].append(url)
+                    continue
+                active[host] += 1
+            pool.submit(contextvars.copy_context().run, worker, url, host)
+
+    return [{"url": url, "content": results[url]} for url in order if results.get(url) is not None]
+
+
+# ─────────────────────────────────────────────────────
+# REPORTING
+# ─────────────────────────────────────────────────────
+def fetch_stats_msg(delta, rates=None):
+    msg = (f"Connections: {delta.get('pool_hits', 0)} reused · {delta.get('pool_misses', 0)} opened"
+           f" · DNS {delta.get('dns_hits', 0)} cached / {delta.get('dns_misses', 0)} resolved")
+    lookups = delta.get("cache_hits", 0) + delta.get("cache_misses", 0)
+    if lookups:
+        msg += f" · Cache {delta.get('cache_hits', 0)}/{lookups} hits ({delta.get('cache_hits', 0) * 100 // lookups}%)"
+    if delta.get("fetch_bytes"):
+        msg += f" · {delta['fetch_bytes'] / 1024 / 1024:.1f} MB downloaded"
+    if delta.get("fetch_skipped_type"):
+        msg += f" · {delta['fetch_skipped_type']} non-HTML skipped"
+    if delta.get("fetch_throttled"):
+        msg += f" · {delta['fetch_throttled']} throttled (429/503)"
+    if delta.get("fetch_errors"):
+        msg += f" · {delta['fetch_errors']} timed out or failed"
+    if delta.get("charset_detected"):
+        msg += f" · {delta['charset_detected']} charsets guessed"
+    if delta.get("extract_budget_hits"):
+        msg += f" · {delta['extract_budget_hits']} pages over extract budget (meta only)"
+    for host, rps in sorted((rates or {}).items(), key=lambda kv: -kv[1])[:3]:
+        msg += f" · {host} {rps} req/s"
+    return msg
+
+
+def domain_rates(urls):
+    rates = {}
+    for url in urls:
+        host = urlparse(url).netloc.lower()
+        if host not in rates:
+            rates[host] = round(domain_throttle(url).rps(), 1)
+    return rates
+
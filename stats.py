@@ -0,0 +1,29 @@
+import threading
+import contextvars
+from collections import Counter
+
+# Counters go to the process totals and to the Counter of the job doing the work.
+# job_stats is a context variable: threads a job starts are submitted through
+# contextvars.copy_context().run, and llm_backends.run() carries it onto the loop.
+stats       = Counter()
+job_stats   = contextvars.ContextVar("job_stats", default=None)
+_stats_lock = threading.Lock()
+
+def bump(key, n=1):
+    counter = job_stats.get()
+    with _stats_lock:
+        stats[key] += n
+        if counter is not None:
+            counter[key] += n
+
+def current_stats():
+    counter = job_stats.get()
+    return stats if counter is None else counter
+
+def stats_snapshot():
+    with _stats_lock:
+        return dict(current_stats())
+
+def stats_since(before):
+    with _stats_lock:
+        return {k: v - before.get(k, 0) for k, v in current_stats().items() if v != before.get(k, 0)}
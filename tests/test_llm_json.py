@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_json
+
+
+def test_plain_json_is_not_repaired():
+    assert llm_json.parse('{"title": "A", "description": "B"}') == ({"title": "A", "description": "B"}, False)
+
+def test_fenced_json_is_not_repaired():
+    assert llm_json.parse('```json\n{"title": "A"}\n```') == ({"title": "A"}, False)
+
+def test_text_around_object():
+    assert llm_json.parse('Here you go: {"title": "A"} Hope this helps!') == ({"title": "A"}, True)
+
+
+# ─────────────────────────────────────────────────────
+# REPAIRED SHAPES
+# ─────────────────────────────────────────────────────
+@pytest.mark.parametrize("raw, expected", [
+    ("{'title': 'A', 'description': 'B'}",                     {"title": "A", "description": "B"}),
+    ("{'title': 'A', 'description': 'it\\'s fast'}",           {"title": "A", "description": "it's fast"}),
+    ("{'title': 'A', 'description': 'it's fast'}",             {"title": "A", "description": "it's fast"}),
+    ("{'description': 'say \"hi\" twice'}",                    {"description": 'say "hi" twice'}),
+    ('{"title": "A", "description": "the "best" tool"}',       {"title": "A", "description": 'the "best" tool'}),
+    ('{"description": "it\\\'s fast"}',                        {"description": "it's fast"}),
+    ('{"description": "C:\\\\temp and \\d+"}',                 {"description": "C:\\temp and \\d+"}),
+    ("{title: 'A', description: 'B'}",                         {"title": "A", "description": "B"}),
+    ('{"score": 4, "ok": True, "note": None}',                 {"score": 4, "ok": True, "note": None}),
+    ('{"title": "A", "description": "B",}',                    {"title": "A", "description": "B"}),
+    ('{"pages": [{"url": "u", "title": "A"},]}',               {"pages": [{"url": "u", "title": "A"}]}),
+    ('{"description": "line one\nline two"}',                  {"description": "line one\nline two"}),
+    ('{"title": "A", "description": "cut off mid',             {"title": "A", "description": "cut off mid"}),
+    ('{"pages": [{"url": "u", "title": "A"}, {"url": "v", "title":', {"pages": [{"url": "u", "title": "A"}, {"url": "v", "title": None}]}),
+])
+def test_repaired(raw, expected):
+    assert llm_json.parse(raw) == (expected, True)
+
+def test_unrepairable():
+    with pytest.raises(ValueError):
+        llm_json.parse("no json here")
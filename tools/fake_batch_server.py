@@ -0,0 +1,152 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_backends import fake_reply
+
+# Stand-in for the parts of the OpenAI API the generator uses: chat completions,
+# file upload/download and the Batch API. Replies are derived from the prompt so
+# runs are repeatable, and match LLM_BACKEND=fake (llm_backends.fake_reply).
+# Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8800/v1
+
+files   = {}
+batches = {}
+lock    = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────
+# DETERMINISTIC REPLIES
+# ─────────────────────────────────────────────────────
+def completion(body):
+    prompt  = body["messages"][-1]["content"]
+    content = json.dumps(fake_reply(prompt))
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex[:12], "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(prompt) + len(content)) // 4},
+    }
+
+
+# ─────────────────────────────────────────────────────
+# BATCH PROCESSING
+# ─────────────────────────────────────────────────────
+def store_file(content, filename, purpose):
+    file_id = "file-" + uuid.uuid4().hex[:16]
+    with lock:
+        files[file_id] = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                          "filename": filename, "purpose": purpose, "status": "processed", "content": content}
+    return files[file_id]
+
+def run_batch(batch_id, delay, fail_every):
+    batch = batches[batch_id]
+    lines = [line for line in files[batch["input_file_id"]]["content"].decode("utf-8").splitlines() if line.strip()]
+    batch.update(status="in_progress", in_progress_at=int(time.time()))
+    batch["request_counts"]["total"] = len(lines)
+
+    output, errors = [], []
+    for n, line in enumerate(lines, 1):
+        time.sleep(delay)
+        request = json.loads(line)
+        if fail_every and n % fail_every == 0:
+            errors.append({"id": "req-" + uuid.uuid4().hex[:12], "custom_id": request["custom_id"], "response": None,
+                           "error": {"code": "server_error", "message": "Simulated failure"}})
+            batch["request_counts"]["failed"] += 1
+            continue
+        output.append({"id": "req-" + uuid.uuid4().hex[:12], "custom_id": request["custom_id"], "error": None,
+                       "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion(request["body"])}})
+        batch["request_counts"]["completed"] += 1
+
+    batch["status"] = "finalizing"
+    if output:
+        batch["output_file_id"] = store_file("\n".join(map(json.dumps, output)).encode(), "output.jsonl", "batch_output")["id"]
+    if errors:
+        batch["error_file_id"] = store_file("\n".join(map(json.dumps, errors)).encode(), "errors.jsonl", "batch_output")["id"]
+    batch.update(status="completed", completed_at=int(time.time()))
+
+
+# ─────────────────────────────────────────────────────
+# HTTP
+# ─────────────────────────────────────────────────────
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, obj, status=200):
+        body = obj if isinstance(obj, bytes) else json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if isinstance(obj, bytes) else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self):
+        self.reply({"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}, 404)
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        m = re.fullmatch(r".*/files/([\w-]+)/content", path)
+        if m and m.group(1) in files:
+            return self.reply(files[m.group(1)]["content"])
+        m = re.fullmatch(r".*/batches/([\w-]+)", path)
+        if m and m.group(1) in batches:
+            return self.reply(batches[m.group(1)])
+        self.not_found()
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if path.endswith("/chat/completions"):
+            time.sleep(self.server.latency)
+            return self.reply(completion(json.loads(body)))
+
+        if path.endswith("/files"):
+            form  = BytesParser(policy=policy.default).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+            parts = {part.get_param("name", header="content-disposition"): part for part in form.iter_parts()}
+            entry = store_file(parts["file"].get_payload(decode=True), parts["file"].get_filename() or "upload.jsonl",
+                               parts["purpose"].get_content().strip() if "purpose" in parts else "batch")
+            return self.reply({k: v for k, v in entry.items() if k != "content"})
+
+        if path.endswith("/batches"):
+            request  = json.loads(body)
+            batch_id = "batch_" + uuid.uuid4().hex[:16]
+            batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": request["endpoint"], "errors": None,
+                "input_file_id": request["input_file_id"], "completion_window": request["completion_window"],
+                "status": "validating", "output_file_id": None, "error_file_id": None, "created_at": int(time.time()),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0}, "metadata": request.get("metadata"),
+            }
+            threading.Thread(target=run_batch, args=(batch_id, self.server.delay, self.server.fail_every), daemon=True).start()
+            return self.reply(batches[batch_id])
+
+        self.not_found()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat and Batch APIs.")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds spent per batch request")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each chat completion")
+    parser.add_argument("--fail-every", type=int, default=0, help="fail every Nth batch request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    server.delay, server.latency, server.fail_every = args.delay, args.latency, args.fail_every
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()